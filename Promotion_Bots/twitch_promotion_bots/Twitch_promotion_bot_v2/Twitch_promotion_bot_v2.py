@@ -3,18 +3,31 @@ import re
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
-from twitchAPI.twitch import Twitch
 import asyncio
 from dotenv import load_dotenv
 import json
+import hashlib
+import zlib
+import inspect
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from queue import Queue, Full
+import atexit
 from datetime import datetime
+from collections import OrderedDict
+from types import SimpleNamespace
 import sys
 import glob
-import platform
+import bisect
+import sqlite3
+import math
+import random
 import socket
+import threading
+import time
 import aiohttp
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
 
 # Load environment variables
 load_dotenv()
@@ -23,19 +36,81 @@ load_dotenv()
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 TWITCH_CLIENT_ID = os.getenv('TWITCH_CLIENT_ID')
 TWITCH_CLIENT_SECRET = os.getenv('TWITCH_CLIENT_SECRET')
+TWITCH_USER_ACCESS_TOKEN = os.getenv('TWITCH_USER_ACCESS_TOKEN')  # Only needed for EventSub push mode
 DISCORD_CHANNEL_ID = int(os.getenv('DISCORD_CHANNEL_ID'))
 ALLOWED_ROLE_IDS = [int(role_id) for role_id in os.getenv('ALLOWED_ROLE_IDS').split(',') if role_id]
 ALLOWED_CHANNEL_ID = int(os.getenv('ALLOWED_CHANNEL_ID'))
 LOG_CHANNEL_ID = int(os.getenv('LOG_CHANNEL_ID'))
 GUILD_ID = int(os.getenv('GUILD_ID'))
 MAX_LOG_FILES = 7
+LOG_QUEUE_ENABLED = os.getenv('LOG_QUEUE_ENABLED', 'false').lower() == 'true'  # write logs from a background thread
+LOG_QUEUE_SIZE = 10000  # records buffered before new ones are dropped
+LOG_UPLOAD_PART_SIZE = 8 * 1024 * 1024  # bytes per uploaded log part, safely under Discord's attachment limit
+LOG_UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes read and compressed at a time
 NOTIFICATION_COOLDOWN = 300  # 5 minutes in seconds
 TWITCH_USERNAMES_FILE = "twitch_usernames.json"
-MAX_RETRIES = 5
-RETRY_DELAY = 30  # seconds
+TWITCH_USER_CACHE_FILE = "twitch_user_cache.json"
+NOTIFICATION_STATE_FILE = "notification_state.json"
+POLL_SCHEDULE_FILE = "poll_schedule.json"
+TWITCH_APP_TOKEN_FILE = "twitch_app_token.json"
+USER_CACHE_REFRESH_AGE = 7 * 24 * 3600  # Re-resolve cached user IDs older than a week
+MAX_RETRIES = 5  # consecutive failed reconnects before a component's circuit opens
+RETRY_DELAY = 30  # seconds, base for the jittered exponential reconnect backoff
+CIRCUIT_OPEN_TIME = 900  # seconds to leave a component alone once its circuit opens
+DISCORD_RECONNECT_GRACE = 60  # seconds discord.py gets to reconnect by itself before the supervisor steps in
 TWITCH_API_TIMEOUT = 10  # seconds
 TWITCH_API_RETRIES = 3
+TWITCH_TOKEN_REFRESH_MARGIN = 24 * 3600  # seconds before expiry at which the app access token is renewed
+TWITCH_HELIX_URL = os.getenv('TWITCH_HELIX_URL', 'https://api.twitch.tv/helix')
+TWITCH_TOKEN_URL = os.getenv('TWITCH_TOKEN_URL', 'https://id.twitch.tv/oauth2/token')
 MESSAGE_EDIT_COOLDOWN = 300  # 5 minutes between edits for same message 
+STREAM_CHECK_INTERVAL = 30  # seconds between polling cycles
+BATCHED_POLLING = True  # Poll the whole watchlist with one get_streams call per TWITCH_BATCH_SIZE users
+TWITCH_BATCH_SIZE = 100  # Helix maximum for user_login/user_id/game_id filters
+GAME_CACHE_TTL = 6 * 3600  # seconds a resolved game name stays valid
+GAME_CACHE_SIZE = 1000  # max game names kept in memory (least recently used are evicted)
+POLL_MIN_INTERVAL = STREAM_CHECK_INTERVAL  # seconds between checks for live or soon-to-be-live streamers
+POLL_MAX_INTERVAL = 600  # seconds between checks for streamers that haven't been live in a long time
+POLL_BACKOFF_DAYS = 7  # days offline after which a streamer is polled at POLL_MAX_INTERVAL
+POLL_USUAL_START_WINDOW = 60  # minutes around a streamer's usual start time to poll at POLL_MIN_INTERVAL
+MANUAL_CHECK_MAX_AGE = 120  # seconds a polled status can be reused by /check_new_twitch_live_stream
+WATCHLIST_COMPACT_THRESHOLD = 1000  # journal entries before the watchlist file is rewritten
+
+# DNS cache (getaddrinfo exposes no record TTLs, so cached answers use a fixed TTL)
+DNS_CACHE_TTL = 300  # seconds a successful lookup is served from cache
+DNS_STALE_TTL = 3600  # seconds an expired answer may still be served while it is refreshed in the background
+DNS_NEGATIVE_TTL = 30  # seconds a failed lookup is remembered
+# Fallback addresses per host, format: host=ip1|ip2;host2=ip3
+DNS_FALLBACKS = {
+    host.strip(): [ip.strip() for ip in ips.split('|') if ip.strip()]
+    for host, _, ips in (
+        entry.partition('=') for entry in os.getenv(
+            'DNS_FALLBACKS',
+            'api.twitch.tv=151.101.66.167|151.101.194.167|151.101.2.167|151.101.130.167;discord.gg=162.159.135.233'
+        ).split(';') if '=' in entry
+    )
+}
+
+# EventSub push mode (stream.online / stream.offline / channel.update over WebSocket)
+EVENTSUB_ENABLED = os.getenv('TWITCH_EVENTSUB_ENABLED', 'false').lower() == 'true'
+EVENTSUB_WS_URL = os.getenv('TWITCH_EVENTSUB_WS_URL', 'wss://eventsub.wss.twitch.tv/ws')
+EVENTSUB_SUBSCRIPTIONS_URL = os.getenv('TWITCH_EVENTSUB_SUBSCRIPTIONS_URL', 'https://api.twitch.tv/helix/eventsub/subscriptions')
+EVENTSUB_RECONCILE_INTERVAL = 300  # seconds between polls of users already covered by EventSub
+EVENTSUB_RECONNECT_DELAY = 10  # seconds to wait before opening a fresh WebSocket session
+
+# Sharded monitoring: one notifier process owns Discord, worker processes poll Twitch
+SHARD_ROLE = os.getenv('TWITCH_SHARD_ROLE', '').lower()  # '' (single process), 'notifier' or 'worker'
+SHARD_WORKER_ID = os.getenv('TWITCH_SHARD_WORKER_ID') or f"{socket.gethostname()}-{os.getpid()}"
+SHARD_DB_FILE = os.getenv('TWITCH_SHARD_DB', 'twitch_shards.db')  # shared by all workers and the notifier
+SHARD_COUNT = 256  # fixed number of shards streamers are hashed into
+SHARD_VNODES = 64  # points per worker on the consistent hash ring
+SHARD_LEASE_TTL = 90  # seconds a shard lease (and a worker heartbeat) stays valid without renewal
+SHARD_REPUBLISH_INTERVAL = 300  # seconds after which an unchanged status is published again
+SHARD_NOTIFIER_INTERVAL = 2  # seconds between notifier reads of published transitions
+
+# Prometheus metrics endpoint (http://METRICS_HOST:METRICS_PORT/metrics)
+METRICS_PORT = int(os.getenv('TWITCH_METRICS_PORT', '0'))  # 0 disables the endpoint
+METRICS_HOST = os.getenv('TWITCH_METRICS_HOST', '127.0.0.1')
 
 # Default bot status
 DEFAULT_BOT_STATUS = "online"  # online, idle, dnd, invisible
@@ -46,38 +121,380 @@ class BotState:
     def __init__(self):
         self.twitch_connected = False
         self.discord_connected = True
-        self.connection_retry_count = 0
-        self.last_retry_time = None
         self.last_dns_flush = None
-        self.backoff_factor = 1
-        self.twitch_ip_pool = [
-            '151.101.66.167',
-            '151.101.194.167',
-            '151.101.2.167',
-            '151.101.130.167'
-        ]
-        self.current_twitch_ip = 0
+
+class ConnectionSupervisor:
+    """Keeps the Twitch client and the Discord gateway healthy without restarting the process.
+
+    Failures are reported with report_failure() and never block the caller.
+    The supervisor task then rebuilds only that component, with jittered
+    exponential backoff. Each component is 'connected', 'reconnecting' or
+    'circuit_open'. After MAX_RETRIES failed rebuilds in a row the circuit
+    opens for CIRCUIT_OPEN_TIME, then a single half-open attempt decides
+    whether it closes again.
+    """
+    def __init__(self):
+        self.components = {
+            'twitch': {'state': 'reconnecting', 'failures': 0, 'next_attempt': 0, 'last_error': None, 'grace': 0},
+            'discord': {'state': 'connected', 'failures': 0, 'next_attempt': 0, 'last_error': None, 'grace': DISCORD_RECONNECT_GRACE}
+        }
+        
+    def is_healthy(self, name):
+        return self.components[name]['state'] == 'connected'
+        
+    async def wait_until_healthy(self, name):
+        while not self.is_healthy(name) and not bot.is_closed():
+            await asyncio.sleep(1)
+            
+    def set_connected_flag(self, name, connected):
+        if name == 'twitch':
+            bot.state.twitch_connected = connected
+        else:
+            bot.state.discord_connected = connected
+            
+    def report_failure(self, name, error=None):
+        component = self.components[name]
+        component['last_error'] = str(error) if error else None
+        if component['state'] == 'connected':
+            logging.error(f"{name} connection marked unhealthy: {error}")
+            component['state'] = 'reconnecting'
+            component['next_attempt'] = time.monotonic() + component['grace']
+        self.set_connected_flag(name, False)
+        
+    def report_success(self, name):
+        component = self.components[name]
+        if component['state'] != 'connected':
+            logging.info(f"{name} connection healthy again")
+        component.update(state='connected', failures=0, last_error=None)
+        self.set_connected_flag(name, True)
+        
+    async def run(self):
+        while not bot.is_closed():
+            for name, component in self.components.items():
+                if component['state'] != 'connected' and time.monotonic() >= component['next_attempt']:
+                    await self.rebuild(name)
+            await asyncio.sleep(1)
+            
+    async def rebuild(self, name):
+        component = self.components[name]
+        half_open = component['state'] == 'circuit_open'
+        logging.info(f"Rebuilding {name} connection (attempt {component['failures'] + 1}{', half-open' if half_open else ''})")
+        try:
+            rebuilt = await (rebuild_twitch() if name == 'twitch' else rebuild_discord())
+        except Exception as e:
+            component['last_error'] = str(e)
+            rebuilt = False
+        
+        metrics.inc('connection_rebuilds_total', component=name, result='ok' if rebuilt else 'failed')
+        if rebuilt:
+            self.report_success(name)
+            return
+        
+        component['failures'] += 1
+        if half_open or component['failures'] >= MAX_RETRIES:
+            component['state'] = 'circuit_open'
+            component['next_attempt'] = time.monotonic() + CIRCUIT_OPEN_TIME
+            logging.error(f"{name} circuit open after {component['failures']} failed attempts, next attempt in {CIRCUIT_OPEN_TIME}s (last error: {component['last_error']})")
+        else:
+            delay = self.backoff_delay(component['failures'])
+            component['next_attempt'] = time.monotonic() + delay
+            logging.warning(f"{name} rebuild failed, retrying in {delay:.0f}s (attempt {component['failures']}/{MAX_RETRIES})")
+            
+    def backoff_delay(self, failures):
+        delay = min(RETRY_DELAY * 2 ** (failures - 1), 300)  # Max 5 minutes
+        return random.uniform(delay / 2, delay)
+        
+    async def recover_crashed_client(self, name, error):
+        """A client crashed out of its run loop. Waits out the backoff and returns True if it should be
+        rebuilt in this process, or False after MAX_RETRIES crashes without a healthy connection between them."""
+        self.report_failure(name, error)
+        component = self.components[name]
+        component['failures'] += 1
+        metrics.inc('connection_rebuilds_total', component=name, result='crashed')
+        if component['failures'] >= MAX_RETRIES:
+            logging.critical(f"{name} client crashed {component['failures']} times in a row, giving up (last error: {error})")
+            return False
+        delay = self.backoff_delay(component['failures'])
+        logging.error(f"{name} client crashed: {error}. Rebuilding it in {delay:.0f}s (attempt {component['failures']}/{MAX_RETRIES})")
+        await asyncio.sleep(delay)
+        return True
+        
+    async def probe(self):
+        """Health probes for components that currently look healthy"""
+        if self.is_healthy('twitch'):
+            try:
+                await make_twitch_request(twitch.get_users, logins=['twitch'], limit=1)
+            except Exception as e:
+                self.report_failure('twitch', e)
+        if self.is_healthy('discord') and not (bot.is_ready() and math.isfinite(bot.latency)):
+            self.report_failure('discord', "gateway not ready")
+
+class GameNameCache:
+    """In-process game_id -> name cache with TTL and LRU eviction"""
+    def __init__(self, ttl=GAME_CACHE_TTL, max_size=GAME_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # game_id -> (name, cached_at)
+        
+    def get(self, game_id):
+        entry = self.entries.get(game_id)
+        if not entry:
+            return None
+        name, cached_at = entry
+        if datetime.now().timestamp() - cached_at > self.ttl:
+            del self.entries[game_id]
+            return None
+        self.entries.move_to_end(game_id)
+        return name
+        
+    def set(self, game_id, name):
+        self.entries[game_id] = (name, datetime.now().timestamp())
+        self.entries.move_to_end(game_id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+# Replace a file in one step: write a per-process temp file, fsync it, then rename it over the target,
+# so a crash leaves either the old or the new contents and never a truncated file
+def write_file_atomic(path, data):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+class PollScheduler:
+    """Gives each streamer its own next-check time based on recent live history"""
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.next_check = {}  # username -> timestamp
+        self.history = {}  # username -> {'first_seen', 'last_live', 'is_live', 'starts': [timestamps]}
+        self.dirty = False
+        
+    def is_due(self, username, current_time):
+        return current_time >= self.next_check.get(username, 0)
+        
+    def record(self, username, is_live, current_time):
+        history = self.history.setdefault(username, {'first_seen': current_time, 'last_live': None, 'is_live': False, 'starts': []})
+        if is_live:
+            if not history['is_live']:
+                history['starts'] = (history['starts'] + [current_time])[-20:]
+                self.dirty = True
+            history['last_live'] = current_time
+        elif history['is_live']:
+            self.dirty = True
+        history['is_live'] = is_live
+        self.next_check[username] = current_time + self.interval(username, current_time)
+        
+    def interval(self, username, current_time):
+        history = self.history.get(username)
+        if not history or history['is_live'] or self.near_usual_start(history, current_time):
+            return self.min_interval
+        
+        # Back off linearly with the time since the streamer was last seen live
+        idle_days = (current_time - (history['last_live'] or history['first_seen'])) / 86400
+        backoff = min(1.0, idle_days / POLL_BACKOFF_DAYS)
+        return self.min_interval + (self.max_interval - self.min_interval) * backoff
+        
+    def near_usual_start(self, history, current_time):
+        now = datetime.fromtimestamp(current_time)
+        now_minutes = now.hour * 60 + now.minute
+        for start in history['starts']:
+            start_time = datetime.fromtimestamp(start)
+            difference = abs(now_minutes - (start_time.hour * 60 + start_time.minute))
+            if min(difference, 1440 - difference) <= POLL_USUAL_START_WINDOW:
+                return True
+        return False
+        
+    def load(self):
+        if os.path.exists(POLL_SCHEDULE_FILE):
+            try:
+                with open(POLL_SCHEDULE_FILE, "r") as file:
+                    self.history = json.load(file)
+            except (json.JSONDecodeError, IOError) as e:
+                logging.error(f"Failed to load poll schedule: {e}")
+                
+    async def save(self):
+        # Serialized on the loop so the history can't change mid-dump; the disk write runs in a thread
+        data = json.dumps(self.history)
+        self.dirty = False
+        try:
+            await asyncio.to_thread(write_file_atomic, POLL_SCHEDULE_FILE, data)
+        except IOError as e:
+            self.dirty = True
+            logging.error(f"Failed to save poll schedule: {e}")
+
+class WatchlistStore:
+    """Twitch watchlist with a case-insensitive index and an append-only journal.
+
+    The JSON file holds the last compacted list and mutations since then are
+    appended to <file>.journal, which is replayed on load. After startup all
+    file I/O runs in a worker thread, and compaction replaces the file atomically.
+    """
+    def __init__(self, path, compact_threshold=WATCHLIST_COMPACT_THRESHOLD, repair=True):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.compact_threshold = compact_threshold
+        self.entries = {}  # lowercase login -> username as it was added (insertion ordered)
+        self.journal_entries = 0
+        self.lock = None
+        self.loaded_stamp = None
+        self.load(repair=repair)
+        
+    def __iter__(self):
+        # Iterate over a snapshot so callers can await while the watchlist changes
+        return iter(list(self.entries.values()))
+        
+    def __len__(self):
+        return len(self.entries)
+        
+    def __contains__(self, username):
+        return username.lower() in self.entries
+        
+    def get(self, username):
+        return self.entries.get(username.lower())
         
-    def should_retry(self):
-        if self.connection_retry_count >= MAX_RETRIES:
+    def apply(self, record):
+        if record['op'] == 'add':
+            self.entries.setdefault(record['username'].lower(), record['username'])
+        elif record['op'] == 'remove':
+            self.entries.pop(record['username'].lower(), None)
+            
+    def file_stamp(self):
+        stamp = []
+        for path in (self.path, self.journal_path):
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+        
+    def reload(self):
+        """Pick up changes another process made to the file or journal (used by shard workers)"""
+        if self.file_stamp() == self.loaded_stamp:
             return False
-        if not self.last_retry_time:
+        self.entries = {}
+        self.journal_entries = 0
+        # Never repair from a reader: a "torn" line may just be an append in progress
+        self.load(repair=False)
+        return True
+        
+    def load(self, repair=True):
+        self.loaded_stamp = self.file_stamp()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as file:
+                    for username in json.load(file):
+                        if username:
+                            self.entries.setdefault(username.lower(), username)
+            except (json.JSONDecodeError, IOError) as e:
+                logging.error(f"Failed to load twitch usernames: {e}")
+        
+        if os.path.exists(self.journal_path):
+            torn = False
+            try:
+                with open(self.journal_path, "r") as file:
+                    for line in file:
+                        try:
+                            self.apply(json.loads(line))
+                            self.journal_entries += 1
+                        except (json.JSONDecodeError, KeyError):
+                            # A crash mid-append leaves at most one torn line
+                            logging.warning("Ignoring incomplete twitch usernames journal entry")
+                            torn = True
+                if torn and repair:
+                    # Start a clean journal so new entries aren't appended to the torn line
+                    self.write_snapshot(list(self.entries.values()))
+                    self.journal_entries = 0
+            except IOError as e:
+                logging.error(f"Failed to replay twitch usernames journal: {e}")
+                
+    def get_lock(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        return self.lock
+        
+    async def add(self, username):
+        """Returns False if the user is already monitored. Raises IOError if the change couldn't be saved."""
+        async with self.get_lock():
+            if username in self:
+                return False
+            await self.write_locked({'op': 'add', 'username': username})
             return True
-        return (datetime.now() - self.last_retry_time).total_seconds() > min(
-            self.backoff_factor * RETRY_DELAY, 
-            300  # Max 5 minutes
-        )
         
-    def increment_backoff(self):
-        self.connection_retry_count += 1
-        self.backoff_factor *= 2
-        self.last_retry_time = datetime.now()
-        self.current_twitch_ip = (self.current_twitch_ip + 1) % len(self.twitch_ip_pool)
+    async def remove(self, username):
+        """Returns False if the user isn't monitored. Raises IOError if the change couldn't be saved."""
+        async with self.get_lock():
+            stored = self.get(username)
+            if stored is None:
+                return False
+            await self.write_locked({'op': 'remove', 'username': stored})
+            return True
         
-    def reset_backoff(self):
-        self.connection_retry_count = 0
-        self.backoff_factor = 1
-        self.last_retry_time = None
+    async def write_locked(self, record):
+        # The journal is appended and fsynced first; memory only changes once the change is durable
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.append_journal, json.dumps(record))
+        except IOError as e:
+            logging.error(f"Failed to save twitch usernames: {e}")
+            raise
+        self.apply(record)
+        self.journal_entries += 1
+        if self.journal_entries >= self.compact_threshold:
+            await self.compact_locked()
+                
+    async def compact(self):
+        async with self.get_lock():
+            if self.journal_entries:
+                await self.compact_locked()
+                
+    async def compact_locked(self):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_snapshot, list(self.entries.values()))
+            logging.info(f"Compacted twitch usernames journal ({self.journal_entries} entries, {len(self.entries)} users)")
+            self.journal_entries = 0
+        except IOError as e:
+            logging.error(f"Failed to compact twitch usernames: {e}")
+            
+    def append_journal(self, line):
+        with open(self.journal_path, "a") as file:
+            file.write(line + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+            
+    def write_snapshot(self, usernames):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(usernames, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        # Replaying old journal entries onto the new snapshot is harmless, so truncating last is safe
+        open(self.journal_path, "w").close()
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue: when it is full records are dropped and counted instead of blocking"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported = 0
+
+    def enqueue(self, record):
+        if self.dropped > self.reported:
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"Log queue full, dropped {self.dropped - self.reported} log records"
+                }))
+                self.reported = self.dropped
+            except Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
 
 # Initialize logging
 def setup_logging():
@@ -90,9 +507,12 @@ def setup_logging():
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
     
+    # Shard workers on the same host must not rotate the notifier's log files
+    prefix = f"worker_{SHARD_WORKER_ID}_" if SHARD_ROLE == 'worker' else ""
+    
     # File handler
     file_handler = RotatingFileHandler(
-        "bot_logs.txt",
+        f"{prefix}bot_logs.txt",
         maxBytes=5*1024*1024,  # 5MB
         backupCount=3
     )
@@ -100,18 +520,125 @@ def setup_logging():
     
     # Debug file handler
     debug_handler = RotatingFileHandler(
-        "bot_debug.log",
+        f"{prefix}bot_debug.log",
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
     debug_handler.setFormatter(formatter)
     debug_handler.setLevel(logging.DEBUG)
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(debug_handler)
+    handlers = [console_handler, file_handler, debug_handler]
+    if LOG_QUEUE_ENABLED:
+        # Disk writes and rotation happen on the listener thread instead of the event loop
+        log_queue = Queue(maxsize=LOG_QUEUE_SIZE)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        logger.addHandler(DroppingQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+    return file_handler
+
+log_file_handler = setup_logging()
+
+# Metrics
+class Metrics:
+    """Counters, histograms and scrape-time gauges rendered in the Prometheus text format.
+
+    Everything runs on the event loop, so no locking is needed. Only metrics
+    listed in DEFINITIONS are rendered.
+    """
+    DEFINITIONS = {
+        'twitch_poll_cycle_seconds': ('histogram', "Duration of one polling cycle", (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)),
+        'twitch_polled_users_total': ('counter', "Streamer statuses fetched by polling", None),
+        'twitch_helix_requests_total': ('counter', "Helix requests by endpoint and HTTP status", None),
+        'twitch_helix_request_seconds': ('histogram', "Helix request latency by endpoint", (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)),
+        'twitch_token_refreshes_total': ('counter', "Twitch app access token exchanges", None),
+        'twitch_api_retries_total': ('counter', "Retried Twitch API requests", None),
+        'discord_operations_total': ('counter', "Discord sends/edits by operation and result", None),
+        'discord_retries_total': ('counter', "Retried Discord operations by operation", None),
+        'discord_rate_limited_total': ('counter', "Discord 429 responses by what discord.py did (retried/raised)", None),
+        'discord_queue_wait_seconds': ('histogram', "Time Discord operations spent queued and running", (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)),
+        'connection_rebuilds_total': ('counter', "Supervisor rebuild attempts by component and result", None),
+        'twitch_watchlist_size': ('gauge', "Monitored Twitch users", None),
+        'twitch_live_streamers': ('gauge', "Monitored users currently live", None),
+        'discord_queue_depth': ('gauge', "Discord operations waiting in the outbound queue", None)
+    }
+    
+    def __init__(self):
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts, sum, count]
+        self.gauges = {}  # name -> callable returning the current value
+        
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+        
+    def observe(self, name, value, **labels):
+        buckets = self.DEFINITIONS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[0][index] += 1
+        histogram[1] += value
+        histogram[2] += 1
+        
+    def gauge(self, name, callback):
+        self.gauges[name] = callback
+        
+    @staticmethod
+    def format_labels(labels):
+        if not labels:
+            return ''
+        pairs = []
+        for key, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{key}="{value}"')
+        return '{' + ','.join(pairs) + '}'
+        
+    def render(self):
+        lines = []
+        for name, (kind, description, buckets) in self.DEFINITIONS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in self.counters.items():
+                    if metric == name:
+                        lines.append(f"{name}{self.format_labels(labels)} {value}")
+            elif kind == 'histogram':
+                for (metric, labels), (counts, total, count) in self.histograms.items():
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self.format_labels(labels + (('le', bound),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{self.format_labels(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{self.format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+            elif name in self.gauges:
+                try:
+                    lines.append(f"{name} {self.gauges[name]()}")
+                except Exception as e:
+                    logging.debug(f"Failed to read gauge {name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
 
-setup_logging()
+class DiscordRateLimitCounter(logging.Filter):
+    """Counts the 429s discord.py handles internally, which never reach the outbound throttle.
+
+    discord.py logs a "We are being rate limited" warning on discord.http for every 429 it
+    gets, either before sleeping and retrying or before raising RateLimited.
+    """
+    def filter(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith('We are being rate limited.'):
+            metrics.inc('discord_rate_limited_total', outcome='raised' if 'erroring instead' in record.msg else 'retried')
+        return True
+
+logging.getLogger('discord.http').addFilter(DiscordRateLimitCounter())
 
 # Initialize Discord bot with proper intents
 intents = discord.Intents.default()
@@ -119,128 +646,558 @@ intents.members = True
 intents.message_content = True
 bot = commands.Bot(command_prefix="/", intents=intents)
 bot.state = BotState()
+bot.supervisor = ConnectionSupervisor()
 
 # Twitch API
 twitch = None
 last_notification_times = {}
 last_stream_info = {}
 live_messages = {}
+stream_locks = {}  # username -> asyncio.Lock so polling and EventSub never process the same user at once
+status_observed_at = {}  # username -> time of the newest status applied, to drop stale results
+latest_statuses = {}  # username -> {'stream_info', 'checked_at'}, the newest full status seen from any source
+eventsub_client = None
+game_cache = GameNameCache()
+poll_scheduler = PollScheduler()
 log_upload_enabled = True
-last_message_edit_time = {}
+last_message_edit_time = {}  # message_id -> time of the last successful edit
+last_message_hashes = {}  # message_id -> hash of the content/embed last sent
+pending_edits = {}  # username -> {'stream_info', 'task'} for coalesced game/title edits
 message_edit_attempts = {}  # Track message edit attempts for rate limiting
+notification_state_dirty = False  # Set whenever the per-streamer notification state changes
+notification_state_lock = None  # asyncio.Lock so checkpoints are written one at a time, in order
+notification_flush_task = None  # Immediate checkpoint shared by the announcements that request it together
 
 # DNS cache management
-original_getaddrinfo = socket.getaddrinfo
+class DnsCache:
+    """getaddrinfo cache with negative caching, stale-while-revalidate and per-host fallback addresses.
 
-def getaddrinfo_with_retry(*args, **kwargs):
+    Thread-safe: CachedResolver runs the lookups for cache misses in worker threads.
+    Only sessions created with CachedResolver use it; socket.getaddrinfo is left alone.
+    """
+    def __init__(self, resolver, fallbacks=None):
+        self.resolver = resolver
+        self.fallbacks = fallbacks or {}
+        self.fallback_index = {}
+        self.entries = {}  # key -> (result or None for a failed lookup, expires_at)
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        
+    def cached(self, host, port, *args, **kwargs):
+        """Answer from cache only. Returns None on a miss; expired answers trigger a background refresh."""
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry:
+            return None
+        
+        result, expires_at = entry
+        now = time.monotonic()
+        if now < expires_at:
+            return result if result is not None else self.fallback(host, port, *args, **kwargs)
+        if result is not None and now < expires_at + DNS_STALE_TTL:
+            self.refresh_in_background(key, host, port, *args, **kwargs)
+            return result
+        return None
+        
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        if not isinstance(host, str):
+            return self.resolver(host, port, *args, **kwargs)
+        result = self.cached(host, port, *args, **kwargs)
+        if result is not None:
+            return result
+        return self.lookup((host, port, args, tuple(sorted(kwargs.items()))), host, port, *args, **kwargs)
+        
+    def lookup(self, key, host, port, *args, **kwargs):
+        try:
+            result = self.resolver(host, port, *args, **kwargs)
+        except socket.gaierror:
+            logging.warning(f"DNS resolution failed for {host}")
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry and entry[0] is not None:
+                    # Keep serving the last good answer until it falls out of the stale window
+                    return entry[0]
+                self.entries[key] = (None, time.monotonic() + DNS_NEGATIVE_TTL)
+            return self.fallback(host, port, *args, **kwargs)
+        
+        with self.lock:
+            self.entries[key] = (result, time.monotonic() + DNS_CACHE_TTL)
+        return result
+        
+    def refresh_in_background(self, key, host, port, *args, **kwargs):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        
+        def refresh():
+            try:
+                self.lookup(key, host, port, *args, **kwargs)
+            except socket.gaierror:
+                pass
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+        threading.Thread(target=refresh, daemon=True).start()
+        
+    def fallback(self, host, port, *args, **kwargs):
+        addresses = self.fallbacks.get(host)
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"Could not resolve {host}")
+        
+        # Rotate through the configured addresses on every fallback
+        with self.lock:
+            index = self.fallback_index.get(host, 0)
+            self.fallback_index[host] = (index + 1) % len(addresses)
+        logging.info(f"Using fallback address {addresses[index]} for {host}")
+        return self.resolver(addresses[index], port, *args, **kwargs)
+        
+    def expire(self):
+        """Force revalidation: cached answers are still served, but refreshed in the background"""
+        now = time.monotonic()
+        with self.lock:
+            self.entries = {
+                key: (result, now) for key, (result, expires_at) in self.entries.items() if result is not None
+            }
+
+class CachedResolver(AbstractResolver):
+    """aiohttp resolver that answers cache hits on the event loop and only uses a thread on misses"""
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        infos = dns_cache.cached(host, port, family, socket.SOCK_STREAM)
+        if infos is None:
+            infos = await asyncio.get_running_loop().run_in_executor(
+                None, dns_cache.getaddrinfo, host, port, family, socket.SOCK_STREAM
+            )
+        return [
+            {
+                'hostname': host,
+                'host': address[0],
+                'port': address[1],
+                'family': info_family,
+                'proto': proto,
+                'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV
+            }
+            for info_family, _, proto, _, address in infos
+        ]
+        
+    async def close(self):
+        pass
+
+dns_cache = DnsCache(socket.getaddrinfo, DNS_FALLBACKS)
+
+async def start_discord():
+    """Log in and run the gateway until the bot is closed on purpose.
+
+    If the client crashes out of bot.start, the supervisor rebuilds it in this process, so the
+    notification state and caches in memory survive. Errors a rebuild can't fix, and repeated
+    crashes, are raised so the process exits and a service manager can decide what to do.
+    """
     try:
-        return original_getaddrinfo(*args, **kwargs)
-    except socket.gaierror:
-        logging.warning(f"DNS resolution failed for {args[0]}, retrying with direct IP")
-        # Try with known IPs as fallback
-        if args[0] == 'api.twitch.tv':
-            ip = bot.state.twitch_ip_pool[bot.state.current_twitch_ip]
-            logging.info(f"Using Twitch IP: {ip}")
-            return original_getaddrinfo(ip, args[1], *args[2:], **kwargs)
-        elif 'discord.gg' in args[0]:
-            return original_getaddrinfo('162.159.135.233', args[1], *args[2:], **kwargs)
-        raise
+        while True:
+            # discord.py's HTTP session resolves through CachedResolver. The connector is created inside the
+            # running loop: aiohttp binds it to the loop it was made on, and closing the client closes it.
+            bot.http.connector = aiohttp.TCPConnector(resolver=CachedResolver(), limit=0)
+            try:
+                await bot.start(DISCORD_TOKEN)
+                return
+            except (discord.LoginFailure, discord.PrivilegedIntentsRequired):
+                raise
+            except Exception as e:
+                await bot.close()
+                await save_notification_state()
+                if not await bot.supervisor.recover_crashed_client('discord', e):
+                    raise
+                bot.clear()
+    finally:
+        await bot.close()
+
+# Monitored Twitch usernames
+# Shard workers only read the watchlist; repairing a torn journal is left to the notifier
+TWITCH_USERNAMES = WatchlistStore(TWITCH_USERNAMES_FILE, repair=SHARD_ROLE != 'worker')
+
+# Checkpoint/restore per-streamer notification state so restarts don't re-announce
+async def save_notification_state():
+    global notification_state_dirty, notification_state_lock
+    if notification_state_lock is None:
+        notification_state_lock = asyncio.Lock()
+    state = {
+        'live_messages': live_messages,
+        'last_stream_info': last_stream_info,
+        'last_notification_times': last_notification_times,
+        'message_edit_attempts': {str(message_id): data for message_id, data in message_edit_attempts.items()}
+    }
+    # Serialized on the loop so the state can't change mid-dump; the disk write runs in a thread.
+    # Changes made while it is written mark the state dirty again.
+    data = json.dumps(state, indent=2)
+    notification_state_dirty = False
+    async with notification_state_lock:
+        try:
+            await asyncio.to_thread(write_file_atomic, NOTIFICATION_STATE_FILE, data)
+            return True
+        except IOError as e:
+            notification_state_dirty = True
+            logging.error(f"Failed to save notification state: {e}")
+            return False
+
+async def flush_notification_state():
+    """Write the notification state now rather than at the next checkpoint. Callers that arrive together
+    (a burst of streams going live in one poll) share a write instead of each dumping the whole state."""
+    global notification_flush_task
+    mark_notification_state_dirty()
+    if notification_flush_task is None or notification_flush_task.done():
+        notification_flush_task = asyncio.create_task(write_dirty_notification_state())
+    # Shielded: a cancelled caller mustn't cancel the write the others are waiting on
+    await asyncio.shield(notification_flush_task)
+
+async def write_dirty_notification_state():
+    await asyncio.sleep(0)  # Let the rest of the burst update the state first
+    # Changes made during a write are picked up by another one before the waiting callers resume
+    while notification_state_dirty:
+        if not await save_notification_state():
+            return
 
-socket.getaddrinfo = getaddrinfo_with_retry
+def restore_notification_state():
+    if not os.path.exists(NOTIFICATION_STATE_FILE):
+        return
+    try:
+        with open(NOTIFICATION_STATE_FILE, "r") as file:
+            state = json.load(file)
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Failed to load notification state: {e}")
+        return
+    
+    live_messages.update(state.get('live_messages', {}))
+    last_stream_info.update(state.get('last_stream_info', {}))
+    last_notification_times.update(state.get('last_notification_times', {}))
+    message_edit_attempts.update({int(message_id): data for message_id, data in state.get('message_edit_attempts', {}).items()})
+    
+    live_count = sum(1 for info in last_stream_info.values() if info.get('is_live'))
+    logging.info(f"Restored notification state ({len(live_messages)} messages, {live_count} live streams)")
+
+def mark_notification_state_dirty():
+    global notification_state_dirty
+    notification_state_dirty = True
 
-# Load/save Twitch usernames
-def load_twitch_usernames():
-    if os.path.exists(TWITCH_USERNAMES_FILE):
+# Load/save the login -> user_id resolution cache
+def load_user_cache():
+    if os.path.exists(TWITCH_USER_CACHE_FILE):
         try:
-            with open(TWITCH_USERNAMES_FILE, "r") as file:
+            with open(TWITCH_USER_CACHE_FILE, "r") as file:
                 return json.load(file)
         except (json.JSONDecodeError, IOError) as e:
-            logging.error(f"Failed to load twitch usernames: {e}")
-            return []
-    return []
+            logging.error(f"Failed to load twitch user cache: {e}")
+            return {}
+    return {}
 
-def save_twitch_usernames(usernames):
+def save_user_cache():
+    # Shard workers share this file and each resolves only its own shards' logins, so merge in what the
+    # others wrote (the newest resolution of a login wins) rather than replacing it with ours alone.
+    # Two saves racing can still drop an entry, but its owner writes it back with its next save.
+    for login, entry in load_user_cache().items():
+        if login in removed_user_cache_logins:
+            continue
+        current = twitch_user_cache.get(login)
+        if current is None or entry.get('resolved_at', 0) > current.get('resolved_at', 0):
+            twitch_user_cache[login] = entry
     try:
-        with open(TWITCH_USERNAMES_FILE, "w") as file:
-            json.dump(usernames, file, indent=2)
+        write_file_atomic(TWITCH_USER_CACHE_FILE, json.dumps(twitch_user_cache, indent=2))
     except IOError as e:
-        logging.error(f"Failed to save twitch usernames: {e}")
+        logging.error(f"Failed to save twitch user cache: {e}")
 
-TWITCH_USERNAMES = load_twitch_usernames()
+# Format: {login (lowercase): {"user_id": "...", "display_name": "...", "resolved_at": timestamp}}
+twitch_user_cache = load_user_cache()
+removed_user_cache_logins = set()  # Logins dropped from the cache here, so merging with the file doesn't bring them back
 
-async def make_twitch_request(coro_func, *args, **kwargs):
-    """Helper function to make Twitch API requests with retry logic"""
-    for attempt in range(TWITCH_API_RETRIES):
+def cache_twitch_user(login, user):
+    removed_user_cache_logins.discard(login.lower())
+    twitch_user_cache[login.lower()] = {
+        'user_id': user.id,
+        'display_name': user.display_name,
+        'resolved_at': datetime.now().timestamp()
+    }
+
+def get_cached_user_id(username):
+    return twitch_user_cache.get(username.lower(), {}).get('user_id')
+
+unresolved_logins = {}  # login -> last failed resolution time, so unknown logins aren't retried every cycle
+
+class HelixClient:
+    """Helix client with one pooled HTTP session and a persisted app access token.
+
+    The token is saved with its expiry to TWITCH_APP_TOKEN_FILE and reused
+    across reconnects and restarts. It is renewed TWITCH_TOKEN_REFRESH_MARGIN
+    before it expires, or straight away if Helix rejects it. The get_* methods
+    are async generators yielding objects with the Helix field names as attributes.
+    """
+    def __init__(self, client_id, client_secret, token_file=TWITCH_APP_TOKEN_FILE):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_file = token_file
+        self.access_token = None
+        self.expires_at = 0
+        self.session = None
+        self.token_lock = None  # created lazily so it binds to the running loop
+        self.load_token()
+        
+    def load_token(self):
         try:
-            # For async generators, we need to collect the results
-            result = []
-            async for item in coro_func(*args, **kwargs):
-                result.append(item)
-            return result
+            if os.path.exists(self.token_file):
+                with open(self.token_file, 'r') as f:
+                    data = json.load(f)
+                # A token minted for another client ID is useless to us
+                if data.get('client_id') == self.client_id:
+                    self.access_token = data.get('access_token')
+                    self.expires_at = data.get('expires_at', 0)
+        except Exception as e:
+            logging.error(f"Error loading Twitch app token: {e}")
+            
+    def save_token(self):
+        try:
+            temp_file = f"{self.token_file}.{os.getpid()}.tmp"
+            with open(temp_file, 'w') as f:
+                json.dump({'client_id': self.client_id, 'access_token': self.access_token, 'expires_at': self.expires_at}, f)
+            os.replace(temp_file, self.token_file)
         except Exception as e:
-            if attempt == TWITCH_API_RETRIES - 1:
+            logging.error(f"Error saving Twitch app token: {e}")
+            
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(resolver=CachedResolver(), keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=TWITCH_API_TIMEOUT)
+            )
+        return self.session
+        
+    async def ensure_token(self, rejected=None):
+        """Return a valid app token, doing the client-credentials exchange only when needed"""
+        if self.token_lock is None:
+            self.token_lock = asyncio.Lock()
+        async with self.token_lock:
+            # Another request may already have replaced the rejected token
+            if self.access_token and self.access_token != rejected and self.expires_at - time.time() > TWITCH_TOKEN_REFRESH_MARGIN:
+                return self.access_token
+            
+            params = {'client_id': self.client_id, 'client_secret': self.client_secret, 'grant_type': 'client_credentials'}
+            async with self.get_session().post(TWITCH_TOKEN_URL, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+            self.access_token = data['access_token']
+            self.expires_at = time.time() + data.get('expires_in', 0)
+            self.save_token()
+            metrics.inc('twitch_token_refreshes_total')
+            logging.info(f"Obtained new Twitch app access token (expires in {data.get('expires_in', 0) // 3600}h)")
+            return self.access_token
+            
+    async def get(self, endpoint, params):
+        token = await self.ensure_token()
+        for attempt in range(2):
+            headers = {'Client-Id': self.client_id, 'Authorization': f"Bearer {token}"}
+            started = time.monotonic()
+            try:
+                async with self.get_session().get(f"{TWITCH_HELIX_URL}/{endpoint}", params=params, headers=headers) as response:
+                    metrics.inc('twitch_helix_requests_total', endpoint=endpoint, status=response.status)
+                    if response.status == 401 and attempt == 0:
+                        token = await self.ensure_token(rejected=token)
+                        continue
+                    response.raise_for_status()
+                    return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                metrics.inc('twitch_helix_requests_total', endpoint=endpoint, status='error')
                 raise
+            finally:
+                metrics.observe('twitch_helix_request_seconds', time.monotonic() - started, endpoint=endpoint)
+                
+    async def paginate(self, endpoint, **filters):
+        # Repeated query parameters (user_id=1&user_id=2) for list filters
+        params = [
+            (key, str(value))
+            for key, values in filters.items() if values is not None
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        cursor = None
+        while True:
+            data = await self.get(endpoint, params + ([('after', cursor)] if cursor else []))
+            for item in data.get('data', []):
+                yield SimpleNamespace(**item)
+            cursor = data.get('pagination', {}).get('cursor')
+            if not cursor or not data.get('data'):
+                return
+                
+    def get_users(self, user_ids=None, logins=None):
+        return self.paginate('users', id=user_ids, login=logins)
+        
+    def get_streams(self, user_id=None, user_login=None, first=20):
+        return self.paginate('streams', user_id=user_id, user_login=user_login, first=first)
+        
+    def get_games(self, game_ids=None, names=None):
+        return self.paginate('games', id=game_ids, name=names)
+        
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+async def stream_twitch_request(coro_func, *args, limit=None, **kwargs):
+    """Yield Twitch API results as pages arrive, with retry logic.
+
+    Pagination stops once `limit` results have been yielded. A failed request
+    is only retried while nothing has been yielded yet, so callers never see
+    duplicates.
+    """
+    if limit and 'first' in inspect.signature(coro_func).parameters:
+        # Don't ask Helix for a bigger page than we are going to read
+        kwargs.setdefault('first', min(limit, TWITCH_BATCH_SIZE))
+    
+    yielded = 0
+    for attempt in range(TWITCH_API_RETRIES):
+        results = coro_func(*args, **kwargs)
+        try:
+            async for item in results:
+                yield item
+                yielded += 1
+                if limit and yielded >= limit:
+                    return
+            return
+        except Exception:
+            if yielded or attempt == TWITCH_API_RETRIES - 1:
+                raise
+            metrics.inc('twitch_api_retries_total')
             await asyncio.sleep(1 + attempt)  # Exponential backoff
-            continue
+        finally:
+            # Cancels any further page requests
+            await results.aclose()
+
+async def make_twitch_request(coro_func, *args, limit=None, **kwargs):
+    """Helper function to make Twitch API requests with retry logic, collecting at most `limit` results"""
+    return [item async for item in stream_twitch_request(coro_func, *args, limit=limit, **kwargs)]
+
+async def first_twitch_result(coro_func, *args, **kwargs):
+    """First result of a Twitch API request, or None. Never fetches past the first page."""
+    results = await make_twitch_request(coro_func, *args, limit=1, **kwargs)
+    return results[0] if results else None
 
 # Twitch API functions
 async def init_twitch():
     global twitch
     try:
-        # Initialize Twitch without custom session (newer versions don't support session parameter)
-        twitch = await Twitch(TWITCH_CLIENT_ID, TWITCH_CLIENT_SECRET)
-        bot.state.twitch_connected = True
-        bot.state.reset_backoff()
+        # One client for the bot's lifetime: reconnects keep the pooled session and the persisted app token
+        if twitch is None:
+            twitch = HelixClient(TWITCH_CLIENT_ID, TWITCH_CLIENT_SECRET)
+        
+        # A cheap Helix call confirms connectivity and the token, and warms the connection pool
+        await twitch.get('users', [('login', 'twitch')])
         logging.info("Twitch API initialized successfully")
         return True
     except Exception as e:
         logging.error(f"Error initializing Twitch API: {e}")
-        bot.state.twitch_connected = False
         return False
 
+def report_twitch_batch_error(description, error):
+    """Log a failed batched Helix request. Only failures that aren't Helix rejecting the request itself
+    (e.g. a 400 for a malformed login) mark the Twitch connection unhealthy."""
+    logging.error(f"Error {description}: {error}")
+    rejected = (isinstance(error, aiohttp.ClientResponseError) and 400 <= error.status < 500
+                and error.status not in (401, 429))
+    if not rejected:
+        bot.supervisor.report_failure('twitch', error)
+
+async def resolve_twitch_users(usernames):
+    """Resolve logins missing from the user cache with one get_users call per 100 logins"""
+    current_time = datetime.now().timestamp()
+    missing = list({
+        username.lower() for username in usernames
+        if username and not get_cached_user_id(username)
+        and current_time - unresolved_logins.get(username.lower(), 0) > 3600
+    })
+    if not missing:
+        return
+    
+    failed = set()
+    for i in range(0, len(missing), TWITCH_BATCH_SIZE):
+        batch = missing[i:i + TWITCH_BATCH_SIZE]
+        try:
+            async for user in stream_twitch_request(twitch.get_users, logins=batch):
+                cache_twitch_user(user.login, user)
+        except Exception as e:
+            # The batch's logins stay unresolved and are polled by login; the other batches carry on
+            report_twitch_batch_error(f"resolving {len(batch)} Twitch logins", e)
+            failed.update(batch)
+    
+    for login in missing:
+        if get_cached_user_id(login):
+            unresolved_logins.pop(login, None)
+        elif login not in failed:
+            unresolved_logins[login] = current_time
+    
+    save_user_cache()
+    logging.info(f"Resolved {len(missing)} Twitch logins to user IDs")
+
 async def validate_twitch_user(username):
+    if get_cached_user_id(username):
+        return True
     try:
-        results = await make_twitch_request(twitch.get_users, logins=[username])
-        return len(results) > 0
+        user = await first_twitch_result(twitch.get_users, logins=[username])
+        if user:
+            cache_twitch_user(username, user)
+            save_user_cache()
+        return user is not None
     except Exception as e:
         logging.error(f"Error validating Twitch user {username}: {e}")
-        bot.state.twitch_connected = False
-        await handle_connection_error()
+        bot.supervisor.report_failure('twitch', e)
         return False
 
+async def get_game_names(streams):
+    """Map stream id -> game name, preferring the game_name already in the streams payload.
+
+    Streams without one fall back to game_cache, and any game_ids still
+    unknown are looked up with one get_games call per 100 IDs.
+    """
+    missing = list({
+        stream.game_id for stream in streams
+        if stream.game_id and not stream.game_name and game_cache.get(stream.game_id) is None
+    })
+    for i in range(0, len(missing), TWITCH_BATCH_SIZE):
+        batch = missing[i:i + TWITCH_BATCH_SIZE]
+        async for game in stream_twitch_request(twitch.get_games, game_ids=batch):
+            game_cache.set(game.id, game.name)
+    
+    game_names = {}
+    for stream in streams:
+        if stream.game_name:
+            game_cache.set(stream.game_id, stream.game_name)
+            game_names[stream.id] = stream.game_name
+        else:
+            game_names[stream.id] = (stream.game_id and game_cache.get(stream.game_id)) or "Unknown Game"
+    return game_names
+
 async def is_user_live(username):
     try:
-        # First get user ID
-        users = await make_twitch_request(twitch.get_users, logins=[username])
-        if not users:
-            return {'is_live': False, 'error': 'User not found'}
-        
-        user_id = users[0].id
+        # First get user ID, from the cache when possible
+        user_id = get_cached_user_id(username)
+        if not user_id:
+            user = await first_twitch_result(twitch.get_users, logins=[username])
+            if not user:
+                return {'is_live': False, 'error': 'User not found'}
+            
+            user_id = user.id
+            cache_twitch_user(username, user)
+            save_user_cache()
         
         # Check stream status
-        streams = await make_twitch_request(twitch.get_streams, user_id=[user_id])
-        if not streams:
+        stream_info = await first_twitch_result(twitch.get_streams, user_id=[user_id])
+        if not stream_info:
             return {'is_live': False}
         
-        stream_info = streams[0]
-        
-        # Get game info
-        game_name = "Unknown Game"
-        if stream_info.game_id:
-            games = await make_twitch_request(twitch.get_games, game_ids=[stream_info.game_id])
-            if games:
-                game_name = games[0].name
-        
         return {
             'is_live': True,
             'title': stream_info.title,
-            'game': game_name,
+            'game': (await get_game_names([stream_info]))[stream_info.id],
             'viewers': stream_info.viewer_count,
             'thumbnail': stream_info.thumbnail_url
         }
     except Exception as e:
         logging.error(f"Error checking if {username} is live: {e}")
-        bot.state.twitch_connected = False
+        bot.supervisor.report_failure('twitch', e)
         return {'is_live': False, 'error': str(e)}
 
 def create_stream_embed(username, stream_info, is_live=True):
@@ -308,8 +1265,110 @@ def create_stream_embed(username, stream_info, is_live=True):
         embed.set_footer(text="Stream Ended • Twitch")
         return embed
 
+# Discord outbound queue
+class DiscordOutboundThrottle:
+    """Single outbound queue for Discord sends and edits, held to a fixed rate per channel.
+
+    This is a client-side throttle, not a mirror of Discord's rate limits: discord.py
+    already reads the X-RateLimit-* headers and waits out or retries 429s inside its
+    HTTP client, so neither reaches this class. Operations are queued per route
+    (operation kind + channel) and each channel gets a fixed budget of `limit`
+    operations per `window` seconds, shared by its sends and edits, so a burst of
+    go-lives is paced in order instead of piling up in discord.py's bucket waits.
+    """
+    def __init__(self, limit=5, window=5):
+        self.limit = limit
+        self.window = window
+        self.queues = {}  # route -> asyncio.Queue
+        self.workers = {}  # route -> worker task
+        self.windows = {}  # channel id -> {'remaining', 'reset_at'}
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        
+    @property
+    def queue_depth(self):
+        return sum(queue.qsize() for queue in self.queues.values())
+        
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'completed': self.completed,
+            'average_wait': self.total_wait / self.completed if self.completed else 0.0,
+            'max_wait': self.max_wait
+        }
+        
+    async def submit(self, route, operation):
+        """Queue operation (a zero-argument coroutine function) on route and await its result"""
+        future = asyncio.get_running_loop().create_future()
+        queue = self.queues.get(route)
+        if queue is None:
+            queue = self.queues[route] = asyncio.Queue()
+            self.workers[route] = asyncio.create_task(self.worker(route, queue))
+        queue.put_nowait((operation, future, datetime.now().timestamp()))
+        return await future
+        
+    async def worker(self, route, queue):
+        while True:
+            operation, future, enqueued_at = await queue.get()
+            if future.done():
+                continue
+            
+            result = error = None
+            for attempt in range(3):
+                await self.acquire(route[1])
+                if attempt:
+                    metrics.inc('discord_retries_total', operation=route[0])
+                try:
+                    result = await operation()
+                    error = None
+                    break
+                except discord.HTTPException as e:
+                    # discord.py has already retried 429s and most 5xx responses; 503 isn't among them
+                    error = e
+                    if e.status == 503:  # Service unavailable
+                        logging.warning(f"Service unavailable on {route}, retrying in 5s (attempt {attempt + 1}/3)")
+                        await asyncio.sleep(5)
+                    else:
+                        break
+                except Exception as e:
+                    error = e
+                    break
+            # The caller may have been cancelled meanwhile (e.g. a superseded delayed edit); the outcome
+            # counted below is the operation's, not whether anyone was still waiting for it
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            metrics.inc('discord_operations_total', operation=route[0], result='error' if error is not None else 'ok')
+            
+            wait = datetime.now().timestamp() - enqueued_at
+            metrics.observe('discord_queue_wait_seconds', wait)
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            
+    async def acquire(self, channel_id):
+        """Wait for a free slot in the channel's fixed window and take it"""
+        while True:
+            now = time.monotonic()
+            window = self.windows.setdefault(channel_id, {'remaining': self.limit, 'reset_at': now + self.window})
+            if now >= window['reset_at']:
+                window['remaining'] = self.limit
+                window['reset_at'] = now + self.window
+            if window['remaining'] > 0:
+                window['remaining'] -= 1
+                return
+            await asyncio.sleep(window['reset_at'] - now)
+
+discord_throttle = DiscordOutboundThrottle()
+
 async def safe_message_edit(msg, **kwargs):
-    """Safely edit a message with retry logic and rate limit tracking"""
+    """Safely edit a message through the outbound queue with rate limit tracking.
+
+    Raises discord.NotFound so callers can re-send when the message was deleted.
+    """
     message_id = msg.id
     current_time = datetime.now().timestamp()
     
@@ -322,222 +1381,833 @@ async def safe_message_edit(msg, **kwargs):
         logging.debug(f"Skipping edit for message {message_id} due to multiple recent failures")
         return False
     
-    for attempt in range(3):
-        try:
-            await msg.edit(**kwargs)
-            # Reset attempt counter on success
-            message_edit_attempts[message_id] = {'count': 0, 'last_attempt': current_time}
+    try:
+        await discord_throttle.submit(('edit', msg.channel.id), lambda: msg.edit(**kwargs))
+        # Reset attempt counter on success
+        message_edit_attempts[message_id] = {'count': 0, 'last_attempt': current_time}
+        return True
+    except discord.NotFound:
+        raise
+    except discord.HTTPException as e:
+        if e.status == 429:
+            # Track this failure so the message is left alone for a while
+            message_edit_attempts[message_id] = {
+                'count': attempt_count + 1,
+                'last_attempt': current_time
+            }
+        logging.error(f"Failed to edit message {message_id}: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"Unexpected error editing message: {e}")
+        return False
+
+async def safe_message_send(channel, *args, **kwargs):
+    """Safely send a message through the outbound queue"""
+    try:
+        return await discord_throttle.submit(('send', channel.id), lambda: channel.send(*args, **kwargs))
+    except discord.HTTPException as e:
+        logging.error(f"Failed to send message: {e}")
+        return None
+    except Exception as e:
+        logging.error(f"Unexpected error sending message: {e}")
+        return None
+
+async def fetch_live_statuses(usernames):
+    """Resolve the live status of every username with one get_streams call per 100 users.
+
+    Returns a dict of username -> stream info in the same shape as is_user_live. Users whose
+    batch failed are left out (so a failed request is never mistaken for offline) while the
+    other batches still report; None if no batch succeeded.
+    """
+    # Only logins that were never resolved pay for get_users
+    await resolve_twitch_users(usernames)
+    
+    user_ids = {}
+    logins = {}
+    for username in usernames:
+        user_id = get_cached_user_id(username)
+        if user_id:
+            user_ids.setdefault(user_id, []).append(username)
+        else:
+            logins.setdefault(username.lower(), []).append(username)
+    
+    statuses = {}
+    streams = []
+    # Logins that could not be resolved (e.g. banned accounts) are still polled by login
+    batches = [('user_id', user_ids, list(user_ids)), ('user_login', logins, list(logins))]
+    for parameter, users, keys in batches:
+        for i in range(0, len(keys), TWITCH_BATCH_SIZE):
+            batch = keys[i:i + TWITCH_BATCH_SIZE]
+            batch_users = [username for key in batch for username in users[key]]
+            try:
+                streams.extend(await make_twitch_request(twitch.get_streams, limit=len(batch), **{parameter: batch}))
+            except Exception as e:
+                report_twitch_batch_error(f"fetching live statuses for {len(batch_users)} users", e)
+                continue
+            statuses.update((username, {'is_live': False}) for username in batch_users)
+    
+    try:
+        game_names = await get_game_names(streams)
+    except Exception as e:
+        # Without game names the live users' statuses would read as game changes; skip them this time
+        report_twitch_batch_error(f"fetching game names for {len(streams)} live streams", e)
+        game_names = None
+    
+    for stream in streams:
+        for username in user_ids.get(stream.user_id) or logins.get(stream.user_login.lower(), []):
+            if game_names is None:
+                statuses.pop(username, None)
+                continue
+            statuses[username] = {
+                'is_live': True,
+                'title': stream.title,
+                'game': game_names[stream.id],
+                'viewers': stream.viewer_count,
+                'thumbnail': stream.thumbnail_url
+            }
+    
+    if usernames and not statuses:
+        return None
+    logging.debug(f"Fetched live statuses for {len(statuses)} of {len(usernames)} users ({len(streams)} live)")
+    return statuses
+
+def in_notification_cooldown(username, current_time):
+    last_notified = last_notification_times.get(username, 0)
+    return current_time - last_notified < NOTIFICATION_COOLDOWN and last_stream_info.get(username, {}).get('is_live', False)
+
+def message_hash(content, embed):
+    """Hash of what a message renders to, ignoring the embed timestamp"""
+    embed_data = embed.to_dict() if embed else {}
+    embed_data.pop('timestamp', None)
+    return hashlib.sha1(json.dumps([content, embed_data], sort_keys=True).encode()).hexdigest()
+
+def cancel_pending_edit(username):
+    pending = pending_edits.pop(username, None)
+    if pending:
+        pending['task'].cancel()
+
+async def queue_live_edit(channel, username, stream_info):
+    """Edit the live message now, or merge into a pending edit if the message was edited recently.
+
+    Returns False only if an immediate edit failed (so the change is retried next poll).
+    """
+    pending = pending_edits.get(username)
+    if pending:
+        # An edit is already scheduled; it will apply the latest state
+        pending['stream_info'] = stream_info
+        return True
+    
+    message_id = live_messages[username]
+    delay = last_message_edit_time.get(message_id, 0) + MESSAGE_EDIT_COOLDOWN - datetime.now().timestamp()
+    if delay <= 0:
+        return await flush_live_edit(channel, username, stream_info)
+    
+    pending_edits[username] = {'stream_info': stream_info}
+    pending_edits[username]['task'] = asyncio.create_task(delayed_live_edit(channel, username, delay))
+    logging.debug(f"Deferred edit for {username} by {delay:.0f}s")
+    return True
+
+async def delayed_live_edit(channel, username, delay):
+    await asyncio.sleep(delay)
+    async with stream_locks.setdefault(username, asyncio.Lock()):
+        pending = pending_edits.pop(username, None)
+        if pending and last_stream_info.get(username, {}).get('is_live'):
+            stream_info = pending['stream_info']
+            if await flush_live_edit(channel, username, stream_info):
+                last_notification_times[username] = datetime.now().timestamp()
+                last_stream_info[username] = {
+                    'is_live': True,
+                    'key': f"{username}_{stream_info['title']}_{stream_info['game']}",
+                    'title': stream_info['title'],
+                    'game': stream_info['game']
+                }
+                mark_notification_state_dirty()
+
+async def flush_live_edit(channel, username, stream_info):
+    embed = create_stream_embed(username, stream_info, is_live=True)
+    message_content = f"@everyone **{username}** is live on Twitch!"
+    content_hash = message_hash(message_content, embed)
+    message_id = live_messages[username]
+    
+    # Nothing visible changed since the last edit (e.g. the title was changed back)
+    if last_message_hashes.get(message_id) == content_hash:
+        logging.debug(f"Skipping edit for {username}, message is unchanged")
+        return True
+    
+    try:
+        # No fetch needed, NotFound means the message was deleted
+        msg = channel.get_partial_message(message_id)
+        success = await safe_message_edit(msg, content=message_content, embed=embed)
+        if success:
+            last_message_edit_time[message_id] = datetime.now().timestamp()
+            last_message_hashes[message_id] = content_hash
+            logging.info(f"Updated stream notification for {username} (game/title change)")
             return True
-        except discord.HTTPException as e:
-            if e.status == 429:  # Rate limited
-                retry_after = e.retry_after if hasattr(e, 'retry_after') else (attempt + 1) * 5
-                logging.warning(f"Rate limited editing message {message_id}, retrying in {retry_after}s (attempt {attempt + 1}/3)")
+        logging.warning(f"Failed to edit message for {username} after multiple attempts")
+        return False
+    except discord.NotFound:
+        # Message was deleted, send new one
+        msg = await safe_message_send(channel, message_content, embed=embed)
+        if msg:
+            live_messages[username] = msg.id
+            last_message_hashes[msg.id] = content_hash
+            mark_notification_state_dirty()
+            return True
+        logging.warning(f"Failed to send new message for {username}")
+        return False
+    except Exception as e:
+        logging.error(f"Unexpected error handling message for {username}: {e}")
+        return False
+
+# Stream monitoring - Modified to edit notifications for game changes
+async def process_stream_status(channel, username, stream_info, current_time):
+    """Diff a freshly fetched stream status against last_stream_info and notify/edit accordingly"""
+    if stream_info['is_live']:
+        current_stream_key = f"{username}_{stream_info['title']}_{stream_info['game']}"
+        previous_stream_key = last_stream_info.get(username, {}).get('key', '')
+        
+        # Check if this is a new stream, game change, or title change
+        is_new_stream = not last_stream_info.get(username, {}).get('is_live', False)
+        is_game_change = (not is_new_stream and 
+                        last_stream_info.get(username, {}).get('game') != stream_info['game'])
+        is_title_change = (not is_new_stream and 
+                         last_stream_info.get(username, {}).get('title') != stream_info['title'])
+        
+        # New stream or significant change
+        if is_new_stream or is_game_change or is_title_change:
+            if username in live_messages and not is_new_stream:
+                # Edit existing message for game/title changes, coalesced to one edit per MESSAGE_EDIT_COOLDOWN
+                if not await queue_live_edit(channel, username, stream_info):
+                    return
+                if username in pending_edits:
+                    # last_stream_info is only updated once the deferred edit lands, so a
+                    # restart in between re-detects the change instead of losing it
+                    return
+            else:
+                # Send new message for new streams
+                cancel_pending_edit(username)
+                embed = create_stream_embed(username, stream_info, is_live=True)
+                message_content = f"@everyone **{username}** is live on Twitch!"
+                msg = await safe_message_send(channel, message_content, embed=embed)
+                if msg:
+                    live_messages[username] = msg.id
+                    last_message_hashes[msg.id] = message_hash(message_content, embed)
+                else:
+                    logging.warning(f"Failed to send initial message for {username}")
+                    return
+            
+            last_notification_times[username] = current_time
+            mark_notification_state_dirty()
+            last_stream_info[username] = {
+                'is_live': True,
+                'key': current_stream_key,
+                'title': stream_info['title'],
+                'game': stream_info['game']
+            }
+            
+            if is_new_stream:
+                # Checkpoint right away, now that the stream is recorded as live, so a restart can't re-announce it
+                await flush_notification_state()
+                logging.info(f"Announced live stream for {username}")
+            elif is_game_change:
+                logging.info(f"Updated game for {username}: {stream_info['game']}")
+            elif is_title_change:
+                logging.info(f"Updated title for {username}")
+    else:
+        # Stream is offline - edit the existing message to show offline status
+        cancel_pending_edit(username)
+        if username in live_messages and last_stream_info.get(username, {}).get('is_live', False):
+            try:
+                msg = channel.get_partial_message(live_messages[username])
+                offline_embed = create_stream_embed(username, last_stream_info[username], is_live=False)
                 
-                # Track this attempt
-                message_edit_attempts[message_id] = {
-                    'count': attempt_count + 1,
-                    'last_attempt': current_time
-                }
+                # Edit the existing message to show offline status
+                success = await safe_message_edit(
+                    msg, 
+                    content=f"{username} is now offline", 
+                    embed=offline_embed
+                )
                 
-                await asyncio.sleep(retry_after)
-            elif e.status == 503:  # Service unavailable
-                logging.warning(f"Service unavailable, retrying in 10s (attempt {attempt + 1}/3)")
-                await asyncio.sleep(10)
-            else:
-                logging.error(f"Failed to edit message after {attempt + 1} attempts: {e}")
-                return False
-        except Exception as e:
-            logging.error(f"Unexpected error editing message: {e}")
-            return False
-    return False
+                if success:
+                    logging.info(f"Updated stream status to offline for {username}")
+                else:
+                    logging.warning(f"Failed to update offline status for {username}")
+                    
+            except discord.NotFound:
+                # Message was deleted, remove from tracking
+                if username in live_messages:
+                    del live_messages[username]
+            except Exception as e:
+                logging.error(f"Failed to update offline status for {username}: {e}")
+        
+        if last_stream_info.get(username) != {'is_live': False}:
+            mark_notification_state_dirty()
+        last_stream_info[username] = {'is_live': False}
 
-async def safe_message_send(channel, *args, **kwargs):
-    """Safely send a message with retry logic"""
-    for attempt in range(3):
-        try:
-            msg = await channel.send(*args, **kwargs)
-            return msg
-        except discord.HTTPException as e:
-            if e.status == 429:  # Rate limited
-                retry_after = e.retry_after if hasattr(e, 'retry_after') else (attempt + 1) * 2
-                logging.warning(f"Rate limited sending message, retrying in {retry_after}s (attempt {attempt + 1}/3)")
-                await asyncio.sleep(retry_after)
-            elif e.status == 503:  # Service unavailable
-                logging.warning(f"Service unavailable, retrying in 5s (attempt {attempt + 1}/3)")
-                await asyncio.sleep(5)
-            else:
-                logging.error(f"Failed to send message after {attempt + 1} attempts: {e}")
-                return None
-        except Exception as e:
-            logging.error(f"Unexpected error sending message: {e}")
-            return None
-    return None
+async def apply_stream_status(channel, username, stream_info, observed_at):
+    """Serialize status updates per user and ignore results older than what was already applied"""
+    async with stream_locks.setdefault(username, asyncio.Lock()):
+        if observed_at < status_observed_at.get(username, 0):
+            logging.debug(f"Ignoring stale status for {username}")
+            return
+        status_observed_at[username] = observed_at
+        latest_statuses[username] = {'stream_info': stream_info, 'checked_at': observed_at}
+        await process_stream_status(channel, username, stream_info, observed_at)
+        poll_scheduler.record(username, stream_info['is_live'], observed_at)
 
-# Stream monitoring - Modified to edit notifications for game changes
 async def check_live_status():
     await bot.wait_until_ready()
     channel = bot.get_channel(DISCORD_CHANNEL_ID)
+    last_reconcile_time = 0
     
     while not bot.is_closed():
         try:
-            for username in TWITCH_USERNAMES:
-                if not username:
-                    continue
-                
+            # Don't poll while the supervisor is rebuilding the Twitch client
+            await bot.supervisor.wait_until_healthy('twitch')
+            cycle_start = time.monotonic()
+            
+            if BATCHED_POLLING:
+                # One get_streams call per 100 users, then diff everything in one pass
                 current_time = datetime.now().timestamp()
-                last_notified = last_notification_times.get(username, 0)
-                
-                # Skip if in cooldown period
-                if current_time - last_notified < NOTIFICATION_COOLDOWN and last_stream_info.get(username, {}).get('is_live', False):
-                    continue
+                usernames = [
+                    username for username in TWITCH_USERNAMES
+                    if username and not in_notification_cooldown(username, current_time)
+                ]
                 
-                stream_info = await is_user_live(username)
+                # Users covered by EventSub only need a slow reconciliation poll;
+                # everyone else is polled when their adaptive schedule says so
+                subscribed = []
+                if eventsub_client and eventsub_client.connected:
+                    await eventsub_client.sync_subscriptions(
+                        [get_cached_user_id(username) for username in usernames if get_cached_user_id(username)]
+                    )
+                    subscribed = [username for username in usernames if get_cached_user_id(username) in eventsub_client.subscribed]
+                    if current_time - last_reconcile_time < EVENTSUB_RECONCILE_INTERVAL:
+                        usernames = [username for username in usernames if username not in subscribed]
+                        subscribed = []
+                    else:
+                        last_reconcile_time = current_time
+                usernames = [
+                    username for username in usernames
+                    if username in subscribed or poll_scheduler.is_due(username, current_time)
+                ]
                 
-                if stream_info.get('error'):
-                    logging.error(f"Error checking {username}: {stream_info['error']}")
+                statuses = await fetch_live_statuses(usernames) if usernames else {}
+                if statuses is None:
+                    # Every batch failed; wait out the interval like any other cycle instead of hammering Helix
+                    await asyncio.sleep(POLL_MIN_INTERVAL)
                     continue
+                metrics.inc('twitch_polled_users_total', len(statuses))
                 
-                if stream_info['is_live']:
-                    current_stream_key = f"{username}_{stream_info['title']}_{stream_info['game']}"
-                    previous_stream_key = last_stream_info.get(username, {}).get('key', '')
+                # Process users concurrently; Discord traffic is paced by the outbound queue
+                await asyncio.gather(*(
+                    apply_stream_status(channel, username, stream_info, current_time)
+                    for username, stream_info in statuses.items()
+                ))
+            else:
+                for username in TWITCH_USERNAMES:
+                    if not username:
+                        continue
                     
-                    # Check if this is a new stream, game change, or title change
-                    is_new_stream = not last_stream_info.get(username, {}).get('is_live', False)
-                    is_game_change = (not is_new_stream and 
-                                    last_stream_info.get(username, {}).get('game') != stream_info['game'])
-                    is_title_change = (not is_new_stream and 
-                                     last_stream_info.get(username, {}).get('title') != stream_info['title'])
+                    current_time = datetime.now().timestamp()
                     
-                    # New stream or significant change
-                    if is_new_stream or is_game_change or is_title_change:
-                        embed = create_stream_embed(username, stream_info, is_live=True)
-                        message_content = f"@everyone **{username}** is live on Twitch!"
-                        
-                        if username in live_messages and not is_new_stream:
-                            try:
-                                # Edit existing message for game/title changes
-                                msg = await channel.fetch_message(live_messages[username])
-                                success = await safe_message_edit(msg, content=message_content, embed=embed)
-                                if success:
-                                    logging.info(f"Updated stream notification for {username} (game/title change)")
-                                else:
-                                    logging.warning(f"Failed to edit message for {username} after multiple attempts")
-                                    continue
-                            except discord.NotFound:
-                                # Message was deleted, send new one
-                                msg = await safe_message_send(channel, message_content, embed=embed)
-                                if msg:
-                                    live_messages[username] = msg.id
-                                else:
-                                    logging.warning(f"Failed to send new message for {username}")
-                                    continue
-                            except Exception as e:
-                                logging.error(f"Unexpected error handling message for {username}: {e}")
-                                continue
-                        else:
-                            # Send new message for new streams
-                            msg = await safe_message_send(channel, message_content, embed=embed)
-                            if msg:
-                                live_messages[username] = msg.id
-                            else:
-                                logging.warning(f"Failed to send initial message for {username}")
-                                continue
-                        
-                        last_notification_times[username] = current_time
-                        last_stream_info[username] = {
-                            'is_live': True,
-                            'key': current_stream_key,
-                            'title': stream_info['title'],
-                            'game': stream_info['game']
-                        }
-                        
-                        if is_new_stream:
-                            logging.info(f"Announced live stream for {username}")
-                        elif is_game_change:
-                            logging.info(f"Updated game for {username}: {stream_info['game']}")
-                        elif is_title_change:
-                            logging.info(f"Updated title for {username}")
-                else:
-                    # Stream is offline - edit the existing message to show offline status
-                    if username in live_messages and last_stream_info.get(username, {}).get('is_live', False):
-                        try:
-                            msg = await channel.fetch_message(live_messages[username])
-                            offline_embed = create_stream_embed(username, last_stream_info[username], is_live=False)
-                            
-                            # Edit the existing message to show offline status
-                            success = await safe_message_edit(
-                                msg, 
-                                content=f"{username} is now offline", 
-                                embed=offline_embed
-                            )
-                            
-                            if success:
-                                logging.info(f"Updated stream status to offline for {username}")
-                            else:
-                                logging.warning(f"Failed to update offline status for {username}")
-                                
-                        except discord.NotFound:
-                            # Message was deleted, remove from tracking
-                            if username in live_messages:
-                                del live_messages[username]
-                        except Exception as e:
-                            logging.error(f"Failed to update offline status for {username}: {e}")
+                    # Skip if in cooldown period or not due yet
+                    if in_notification_cooldown(username, current_time) or not poll_scheduler.is_due(username, current_time):
+                        continue
                     
-                    last_stream_info[username] = {'is_live': False}
+                    stream_info = await is_user_live(username)
+                    
+                    if stream_info.get('error'):
+                        logging.error(f"Error checking {username}: {stream_info['error']}")
+                        continue
+                    
+                    metrics.inc('twitch_polled_users_total')
+                    await apply_stream_status(channel, username, stream_info, current_time)
             
-            await asyncio.sleep(30)
+            metrics.observe('twitch_poll_cycle_seconds', time.monotonic() - cycle_start)
+            await asyncio.sleep(POLL_MIN_INTERVAL)
         
         except Exception as e:
             logging.error(f"Error in check_live_status: {e}")
-            await handle_connection_error()
+            await asyncio.sleep(POLL_MIN_INTERVAL)
 
-async def handle_connection_error():
-    if not bot.state.should_retry():
-        logging.error("Max retries reached. Performing full restart...")
-        await restart_bot()
-        return
+# EventSub push mode
+class EventSubWebSocket:
+    """Minimal EventSub WebSocket client feeding stream events into apply_stream_status.
+
+    The URLs are configurable so the client can be pointed at a local stand-in
+    server (e.g. `twitch event websocket start-server` from the Twitch CLI).
+    """
+    SUBSCRIPTION_TYPES = {'stream.online': '1', 'stream.offline': '1', 'channel.update': '2'}
     
-    bot.state.increment_backoff()
-    wait_time = min(bot.state.backoff_factor * RETRY_DELAY, 300)  # Max 5 minutes
+    def __init__(self, on_event, url=EVENTSUB_WS_URL, subscriptions_url=EVENTSUB_SUBSCRIPTIONS_URL):
+        self.on_event = on_event
+        self.url = url
+        self.subscriptions_url = subscriptions_url
+        self.session_id = None
+        self.connected = False
+        self.resuming = False
+        self.subscribed = set()  # broadcaster user IDs with all subscription types enabled
+        self.subscription_limit_reached = False
+        self.seen_message_ids = OrderedDict()
+        self.http = None
+        self.tasks = set()  # Background tasks started by listen(); the loop only keeps weak references
+        
+    @property
+    def headers(self):
+        return {
+            'Client-Id': TWITCH_CLIENT_ID,
+            'Authorization': f"Bearer {TWITCH_USER_ACCESS_TOKEN}",
+            'Content-Type': 'application/json'
+        }
+        
+    async def run(self):
+        self.http = aiohttp.ClientSession(connector=aiohttp.TCPConnector(resolver=CachedResolver()))
+        url = self.url
+        try:
+            while not bot.is_closed():
+                try:
+                    url = await self.listen(url)
+                except Exception as e:
+                    logging.error(f"EventSub WebSocket error: {e}")
+                    url = None
+                
+                self.connected = False
+                self.resuming = url is not None
+                if not self.resuming:
+                    # A new session starts without subscriptions; polling covers everyone until we resubscribe
+                    url = self.url
+                    self.session_id = None
+                    self.subscribed.clear()
+                    self.subscription_limit_reached = False
+                    await asyncio.sleep(EVENTSUB_RECONNECT_DELAY)
+        finally:
+            await self.close()
+            
+    def spawn(self, coro, description):
+        """Run a coroutine in the background, keeping a reference until it finishes and logging its failure"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        
+        def done(task):
+            self.tasks.discard(task)
+            if not task.cancelled() and task.exception():
+                logging.error(f"EventSub {description} failed: {task.exception()}")
+        task.add_done_callback(done)
+        return task
+        
+    async def close(self):
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.http:
+            await self.http.close()
+            
+    async def listen(self, url):
+        """Hold one WebSocket session open. Returns the reconnect URL if Twitch asks us to move."""
+        async with self.http.ws_connect(url) as ws:
+            keepalive_timeout = 10
+            while True:
+                msg = await ws.receive(timeout=keepalive_timeout + 5)
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    logging.warning(f"EventSub WebSocket closed ({msg.type})")
+                    return None
+                
+                data = json.loads(msg.data)
+                metadata = data.get('metadata', {})
+                payload = data.get('payload', {})
+                
+                # Twitch may deliver the same message more than once
+                message_id = metadata.get('message_id')
+                if message_id in self.seen_message_ids:
+                    continue
+                self.seen_message_ids[message_id] = True
+                if len(self.seen_message_ids) > 1000:
+                    self.seen_message_ids.popitem(last=False)
+                
+                message_type = metadata.get('message_type')
+                if message_type == 'session_welcome':
+                    session = payload.get('session', {})
+                    self.session_id = session.get('id')
+                    keepalive_timeout = session.get('keepalive_timeout_seconds') or keepalive_timeout
+                    self.connected = True
+                    logging.info(f"EventSub WebSocket session {self.session_id} established")
+                    if not self.resuming:
+                        self.spawn(self.sync_subscriptions(get_monitored_user_ids()), "subscription sync")
+                elif message_type == 'session_reconnect':
+                    logging.info("EventSub asked to reconnect, moving to new session URL")
+                    return payload.get('session', {}).get('reconnect_url')
+                elif message_type == 'notification':
+                    subscription_type = payload.get('subscription', {}).get('type')
+                    self.spawn(self.on_event(subscription_type, payload.get('event', {})), f"{subscription_type} handler")
+                elif message_type == 'revocation':
+                    subscription = payload.get('subscription', {})
+                    user_id = subscription.get('condition', {}).get('broadcaster_user_id')
+                    self.subscribed.discard(user_id)
+                    logging.warning(f"EventSub {subscription.get('type')} subscription for {user_id} revoked: {subscription.get('status')}")
+                    
+    async def subscribe(self, user_id):
+        for subscription_type, version in self.SUBSCRIPTION_TYPES.items():
+            body = {
+                'type': subscription_type,
+                'version': version,
+                'condition': {'broadcaster_user_id': user_id},
+                'transport': {'method': 'websocket', 'session_id': self.session_id}
+            }
+            async with self.http.post(self.subscriptions_url, json=body, headers=self.headers) as response:
+                if response.status == 429:
+                    # WebSocket transports have a small subscription cost budget; the rest stay on polling
+                    logging.warning(f"EventSub subscription limit reached after {len(self.subscribed)} users")
+                    self.subscription_limit_reached = True
+                    return False
+                if response.status not in (202, 409):  # 409: already subscribed
+                    logging.error(f"Failed to create EventSub {subscription_type} subscription for {user_id}: {response.status} {await response.text()}")
+                    return False
+        self.subscribed.add(user_id)
+        return True
+        
+    async def sync_subscriptions(self, user_ids):
+        """Subscribe any monitored user that isn't covered yet"""
+        for user_id in user_ids:
+            if not self.connected or self.subscription_limit_reached:
+                return
+            if user_id not in self.subscribed:
+                try:
+                    await self.subscribe(user_id)
+                except Exception as e:
+                    logging.error(f"Error subscribing to EventSub for {user_id}: {e}")
+                    return
+
+def get_monitored_user_ids():
+    return [user_id for user_id in (get_cached_user_id(username) for username in TWITCH_USERNAMES if username) if user_id]
+
+async def handle_eventsub_event(subscription_type, event):
+    """Route an EventSub notification into the same notify/edit path the poller uses"""
+    user_id = event.get('broadcaster_user_id')
+    usernames = [username for username in TWITCH_USERNAMES if username and get_cached_user_id(username) == user_id]
+    if not usernames:
+        return
     
-    logging.error(f"Connection error detected. Waiting {wait_time} seconds before retry... (Attempt {bot.state.connection_retry_count}/{MAX_RETRIES})")
-    bot.state.last_retry_time = datetime.now()
-    await asyncio.sleep(wait_time)
+    channel = bot.get_channel(DISCORD_CHANNEL_ID)
+    observed_at = datetime.now().timestamp()
+    logging.info(f"EventSub {subscription_type} for {event.get('broadcaster_user_login')}")
     
     try:
-        # Try flushing DNS cache
-        if platform.system().lower() in ['linux', 'darwin']:  # Linux and MacOS
-            os.system('resolvectl flush-caches || sudo dscacheutil -flushcache || sudo killall -HUP mDNSResponder')
-        elif platform.system().lower() == 'windows':
-            os.system('ipconfig /flushdns')
+        if subscription_type == 'stream.offline':
+            for username in usernames:
+                await apply_stream_status(channel, username, {'is_live': False}, observed_at)
+            return
+        
+        if subscription_type == 'channel.update' and not any(last_stream_info.get(username, {}).get('is_live') for username in usernames):
+            return  # Title/category changes while offline don't touch any message
+        
+        # Events don't carry the thumbnail or viewer count, so fetch the stream itself.
+        # Helix can lag a few seconds behind stream.online, hence the retries.
+        for attempt in range(3):
+            statuses = await fetch_live_statuses(usernames)
+            if statuses is None or any(stream_info['is_live'] for stream_info in statuses.values()):
+                break
+            await asyncio.sleep(5)
+        if not statuses:
+            return
+        
+        for username, stream_info in statuses.items():
+            if stream_info['is_live']:
+                await apply_stream_status(channel, username, stream_info, observed_at)
+    except Exception as e:
+        logging.error(f"Error handling EventSub {subscription_type} event: {e}")
+
+# Sharded monitoring
+def shard_for(username):
+    """Streamers hash into a fixed set of shards, so adding workers never moves a streamer between shards"""
+    return int(hashlib.md5(username.lower().encode()).hexdigest(), 16) % SHARD_COUNT
+
+def shard_owners(workers):
+    """Assign every shard to a worker on a consistent hash ring.
+
+    Adding or removing a worker only moves the shards next to its ring points.
+    """
+    ring = sorted(
+        (int(hashlib.md5(f"{worker}#{vnode}".encode()).hexdigest(), 16), worker)
+        for worker in workers for vnode in range(SHARD_VNODES)
+    )
+    if not ring:
+        return {}
+    points = [point for point, _ in ring]
+    return {
+        shard: ring[bisect.bisect(points, int(hashlib.md5(f"shard-{shard}".encode()).hexdigest(), 16)) % len(ring)][1]
+        for shard in range(SHARD_COUNT)
+    }
+
+class ShardCoordinator:
+    """SQLite store for worker heartbeats, shard leases, the transition outbox and per-shard poll history.
+
+    Every call opens its own short-lived connection in an immediate
+    transaction, so methods can run in executor threads and in several
+    processes (or nodes sharing the file). A worker only polls shards it
+    holds an unexpired lease on. Publishing is rejected for shards whose
+    lease has moved on, so a worker that lost a shard in a rebalance can
+    never post for it.
+    """
+    def __init__(self, path=SHARD_DB_FILE, worker_id=SHARD_WORKER_ID):
+        self.path = path
+        self.worker_id = worker_id
+        self.transaction(lambda db: db.executescript('''
+            CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, heartbeat_at REAL);
+            CREATE TABLE IF NOT EXISTS leases (shard INTEGER PRIMARY KEY, worker_id TEXT, expires_at REAL);
+            CREATE TABLE IF NOT EXISTS transitions (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT, stream_info TEXT, observed_at REAL);
+            CREATE TABLE IF NOT EXISTS poll_history (username TEXT PRIMARY KEY, shard INTEGER, history TEXT);
+        '''), begin=False)
+        
+    def transaction(self, work, begin=True):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            if begin:
+                db.execute('BEGIN IMMEDIATE')
+            result = work(db)
+            if db.in_transaction:
+                db.execute('COMMIT')
+            return result
+        except Exception:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
             
-        if not await init_twitch():
-            raise Exception("Failed to initialize Twitch API")
+    def rebalance(self):
+        """Heartbeat, then release, renew and acquire leases so we hold the shards the ring gives us.
+
+        A shard still leased to its previous owner is only taken once that
+        worker released it on its own rebalance, or its lease expired.
+        Returns (held shards, live worker count).
+        """
+        def work(db):
+            now = time.time()
+            db.execute('INSERT OR REPLACE INTO workers VALUES (?, ?)', (self.worker_id, now))
+            db.execute('DELETE FROM workers WHERE heartbeat_at < ?', (now - SHARD_LEASE_TTL,))
+            workers = [row[0] for row in db.execute('SELECT worker_id FROM workers')]
+            owners = shard_owners(workers)
+            leases = {shard: (holder, expires_at) for shard, holder, expires_at in db.execute('SELECT shard, worker_id, expires_at FROM leases')}
+            
+            held = set()
+            for shard in range(SHARD_COUNT):
+                holder, expires_at = leases.get(shard, (None, 0))
+                if owners[shard] != self.worker_id:
+                    if holder == self.worker_id:
+                        db.execute('DELETE FROM leases WHERE shard = ?', (shard,))
+                elif holder in (None, self.worker_id) or expires_at < now:
+                    db.execute('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)', (shard, self.worker_id, now + SHARD_LEASE_TTL))
+                    held.add(shard)
+            return held, len(workers)
+        return self.transaction(work)
+        
+    def publish(self, transitions):
+        """Queue (shard, username, stream_info, observed_at) transitions for the notifier; returns the accepted ones"""
+        def work(db):
+            held = {
+                shard for (shard,) in db.execute(
+                    'SELECT shard FROM leases WHERE worker_id = ? AND expires_at >= ?', (self.worker_id, time.time())
+                )
+            }
+            accepted = [transition for transition in transitions if transition[0] in held]
+            db.executemany(
+                'INSERT INTO transitions (username, stream_info, observed_at) VALUES (?, ?, ?)',
+                [(username, json.dumps(stream_info), observed_at) for _, username, stream_info, observed_at in accepted]
+            )
+            return accepted
+        return self.transaction(work)
+        
+    def load_poll_history(self, shards):
+        """PollScheduler history of the users in shards, so adaptive intervals survive restarts and moves"""
+        def work(db):
+            rows = db.execute('SELECT shard, username, history FROM poll_history').fetchall()
+            return {username: json.loads(history) for shard, username, history in rows if shard in shards}
+        return self.transaction(work, begin=False)
+        
+    def save_poll_history(self, histories):
+        """Store {username: history JSON} for the shards we still hold; like publish, fenced by the lease"""
+        def work(db):
+            held = {
+                shard for (shard,) in db.execute(
+                    'SELECT shard FROM leases WHERE worker_id = ? AND expires_at >= ?', (self.worker_id, time.time())
+                )
+            }
+            db.executemany(
+                'INSERT OR REPLACE INTO poll_history VALUES (?, ?, ?)',
+                [(username, shard_for(username), history) for username, history in histories.items() if shard_for(username) in held]
+            )
+        self.transaction(work)
+        
+    def pending_transitions(self, limit=500):
+        return self.transaction(lambda db: db.execute(
+            'SELECT id, username, stream_info, observed_at FROM transitions ORDER BY id LIMIT ?', (limit,)
+        ).fetchall())
         
-        if bot.is_closed():
-            await bot.start(DISCORD_TOKEN)
+    def acknowledge(self, last_id):
+        self.transaction(lambda db: db.execute('DELETE FROM transitions WHERE id <= ?', (last_id,)))
         
-        bot.state.reset_backoff()
-        bot.state.twitch_connected = True
-        bot.state.discord_connected = True
+    def leave(self):
+        """Release our leases right away instead of letting them expire"""
+        def work(db):
+            db.execute('DELETE FROM leases WHERE worker_id = ?', (self.worker_id,))
+            db.execute('DELETE FROM workers WHERE worker_id = ?', (self.worker_id,))
+        self.transaction(work)
+
+async def save_shard_poll_history(coordinator):
+    # Serialized on the loop so the history can't change mid-dump
+    histories = {username: json.dumps(history) for username, history in poll_scheduler.history.items()}
+    poll_scheduler.dirty = False
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, coordinator.save_poll_history, histories)
     except Exception as e:
-        await handle_connection_error()
+        poll_scheduler.dirty = True
+        logging.error(f"Failed to save shard poll history: {e}")
+
+async def run_shard_worker():
+    """Worker side of sharded mode: poll the streamers in our leased shards and publish their transitions"""
+    loop = asyncio.get_running_loop()
+    coordinator = ShardCoordinator()
+    held = set()
+    published = {}  # username -> ((is_live, title, game), published_at)
+    # This process never notifies, so count live users from what it published
+    metrics.gauge('twitch_live_streamers', lambda: sum(1 for signature, _ in published.values() if signature[0]))
+    await start_metrics_server()
+    logging.info(f"Shard worker {SHARD_WORKER_ID} starting")
+    
+    while not await init_twitch():
+        await asyncio.sleep(RETRY_DELAY)
+    
+    try:
+        while True:
+            cycle_start = time.monotonic()
+            try:
+                held_now, worker_count = await loop.run_in_executor(None, coordinator.rebalance)
+                if held_now != held:
+                    logging.info(f"Shard worker {SHARD_WORKER_ID} now holds {len(held_now)}/{SHARD_COUNT} shards ({worker_count} workers)")
+                    gained = held_now - held
+                    held = held_now
+                    # Whoever owned a shard before us may have published something else; start over for moved users
+                    published = {username: entry for username, entry in published.items() if shard_for(username) in held}
+                    # Poll history is kept per shard in the coordinator database and moves with the lease
+                    poll_scheduler.history = {username: history for username, history in poll_scheduler.history.items() if shard_for(username) in held}
+                    poll_scheduler.next_check = {username: due for username, due in poll_scheduler.next_check.items() if shard_for(username) in held}
+                    if gained:
+                        poll_scheduler.history.update(await loop.run_in_executor(None, coordinator.load_poll_history, gained))
+                
+                TWITCH_USERNAMES.reload()
+                current_time = datetime.now().timestamp()
+                usernames = [
+                    username for username in TWITCH_USERNAMES
+                    if username and shard_for(username) in held and poll_scheduler.is_due(username, current_time)
+                ]
+                statuses = await fetch_live_statuses(usernames) if usernames else {}
+                
+                if statuses is not None:
+                    bot.supervisor.report_success('twitch')
+                    metrics.inc('twitch_polled_users_total', len(statuses))
+                    transitions = []
+                    for username, stream_info in statuses.items():
+                        poll_scheduler.record(username, stream_info['is_live'], current_time)
+                        signature = (stream_info['is_live'], stream_info.get('title'), stream_info.get('game'))
+                        last = published.get(username)
+                        # Republish unchanged statuses now and then, in case the notifier failed to act on one
+                        if not last or last[0] != signature or current_time - last[1] >= SHARD_REPUBLISH_INTERVAL:
+                            transitions.append((shard_for(username), username, stream_info, current_time))
+                    
+                    accepted = await loop.run_in_executor(None, coordinator.publish, transitions) if transitions else []
+                    for _, username, stream_info, observed_at in accepted:
+                        published[username] = ((stream_info['is_live'], stream_info.get('title'), stream_info.get('game')), observed_at)
+                    if accepted:
+                        logging.info(f"Published {len(accepted)} stream transitions")
+                    if poll_scheduler.dirty:
+                        await save_shard_poll_history(coordinator)
+                    metrics.observe('twitch_poll_cycle_seconds', time.monotonic() - cycle_start)
+            except Exception as e:
+                logging.error(f"Error in shard worker cycle: {e}")
+            
+            await asyncio.sleep(max(0, STREAM_CHECK_INTERVAL - (time.monotonic() - cycle_start)))
+    finally:
+        # Save while we still hold the leases, the save is fenced by them
+        await save_shard_poll_history(coordinator)
+        await loop.run_in_executor(None, coordinator.leave)
+        await twitch.close()
 
-async def restart_bot():
-    logging.info("Restarting bot...")
-    python = sys.executable
-    os.execl(python, python, *sys.argv)
+async def consume_shard_transitions():
+    """Notifier side of sharded mode: apply the transitions workers published, in order per streamer"""
+    await bot.wait_until_ready()
+    channel = bot.get_channel(DISCORD_CHANNEL_ID)
+    loop = asyncio.get_running_loop()
+    coordinator = ShardCoordinator()
+    
+    async def apply_in_order(username, transitions):
+        for stream_info, observed_at in transitions:
+            await apply_stream_status(channel, username, stream_info, observed_at)
+    
+    while not bot.is_closed():
+        try:
+            rows = await loop.run_in_executor(None, coordinator.pending_transitions)
+            if rows:
+                by_user = {}
+                for _, username, stream_info, observed_at in rows:
+                    # The notifier's watchlist is authoritative; drop users removed since the worker polled
+                    if username in TWITCH_USERNAMES:
+                        by_user.setdefault(username, []).append((json.loads(stream_info), observed_at))
+                await asyncio.gather(*(apply_in_order(username, transitions) for username, transitions in by_user.items()))
+                # Applying a transition twice is harmless, so acknowledging after the fact is safe
+                await loop.run_in_executor(None, coordinator.acknowledge, rows[-1][0])
+                continue
+        except Exception as e:
+            logging.error(f"Error applying shard transitions: {e}")
+        await asyncio.sleep(SHARD_NOTIFIER_INTERVAL)
+
+# Metrics endpoint
+metrics.gauge('twitch_watchlist_size', lambda: len(TWITCH_USERNAMES))
+metrics.gauge('twitch_live_streamers', lambda: sum(1 for info in last_stream_info.values() if info.get('is_live')))
+metrics.gauge('discord_queue_depth', lambda: discord_throttle.queue_depth)
+
+metrics_runner = None
+
+async def handle_metrics(request):
+    return web.Response(
+        body=metrics.render().encode('utf-8'),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+async def start_metrics_server():
+    """Serve /metrics on METRICS_HOST:METRICS_PORT if a port is configured (only once per process)"""
+    global metrics_runner
+    if not METRICS_PORT or metrics_runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    metrics_runner = web.AppRunner(app, access_log=None)
+    await metrics_runner.setup()
+    try:
+        await web.TCPSite(metrics_runner, METRICS_HOST, METRICS_PORT).start()
+        logging.info(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        logging.error(f"Failed to start metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}")
+
+async def rebuild_twitch():
+    # Revalidate cached DNS answers in the background (no blocking OS cache flush)
+    dns_cache.expire()
+    bot.state.last_dns_flush = datetime.now()
+    return await init_twitch()
+
+async def rebuild_discord():
+    if bot.is_ready() and math.isfinite(bot.latency):
+        return True
+    if bot.ws is not None:
+        # Close code 4000 makes discord.py reconnect and resume the gateway session
+        await bot.ws.close(code=4000)
+    return False
 
 # Connection health check
 @tasks.loop(minutes=5)
 async def check_connections():
     try:
-        if not bot.state.twitch_connected:
-            logging.info("Attempting to reconnect to Twitch API...")
-            await init_twitch()
-        if not bot.state.discord_connected and bot.is_closed():
-            logging.info("Attempting to reconnect to Discord...")
-            await bot.start(DISCORD_TOKEN)
+        await bot.supervisor.probe()
     except Exception as e:
         logging.error(f"Error in connection health check: {e}")
 
@@ -551,6 +2221,9 @@ async def keep_alive_ping():
         latency = bot.latency
         if latency > 1.0:  # High latency warning
             logging.warning(f"High Discord latency: {latency:.2f}s")
+        stats = discord_throttle.stats()
+        if stats['queue_depth'] > 0:
+            logging.info(f"Discord outbound queue: {stats['queue_depth']} pending, average wait {stats['average_wait']:.2f}s, max wait {stats['max_wait']:.2f}s")
     except Exception as e:
         logging.warning(f"Keep-alive ping failed: {e}")
 
@@ -567,6 +2240,87 @@ def clean_up_logs():
     except Exception as e:
         logging.error(f"Error cleaning up logs: {e}")
 
+def rotate_log_file(archive_path):
+    """Move bot_logs.txt aside; the file handler reopens a fresh one on the next record"""
+    log_file_handler.acquire()
+    try:
+        if log_file_handler.stream:
+            log_file_handler.stream.close()
+            log_file_handler.stream = None
+        os.rename(log_file_handler.baseFilename, archive_path)
+    finally:
+        log_file_handler.release()
+
+def compress_log_parts(path, part_size=LOG_UPLOAD_PART_SIZE):
+    """Gzip path into <path>.gz.partNNN files of at most part_size bytes.
+
+    Meant for a worker thread. The log is streamed in LOG_UPLOAD_CHUNK_SIZE
+    pieces, so memory use doesn't depend on its size. The parts are one gzip
+    stream split by bytes: concatenated in order they form the .gz file.
+    Returns (part paths, compressed size, sha256 of the .gz).
+    """
+    parts = []
+    digest = hashlib.sha256()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    current = None
+    size = 0
+    
+    def write(data):
+        nonlocal current, size
+        while data:
+            if current is None or current.tell() >= part_size:
+                if current:
+                    current.close()
+                parts.append(f"{path}.gz.part{len(parts) + 1:03d}")
+                current = open(parts[-1], "wb")
+            piece = data[:part_size - current.tell()]
+            current.write(piece)
+            digest.update(piece)
+            size += len(piece)
+            data = data[len(piece):]
+    
+    try:
+        with open(path, "rb") as source:
+            while chunk := source.read(LOG_UPLOAD_CHUNK_SIZE):
+                write(compressor.compress(chunk))
+        write(compressor.flush())
+    except Exception:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+        raise
+    finally:
+        if current:
+            current.close()
+    return parts, size, digest.hexdigest()
+
+async def ship_log_file(channel, path, upload_name):
+    """Upload path gzipped, in attachment-sized parts, through the Discord outbound throttle, then a manifest.
+
+    Returns the number of parts uploaded.
+    """
+    parts, size, digest = await asyncio.get_running_loop().run_in_executor(None, compress_log_parts, path)
+    try:
+        for index, part in enumerate(parts, 1):
+            filename = f"{upload_name}.gz.part{index:03d}"
+            # A fresh File per attempt, since a failed upload consumes it
+            await discord_throttle.submit(
+                ('send', channel.id),
+                lambda part=part, filename=filename, index=index: channel.send(
+                    f"{upload_name} part {index}/{len(parts)}", file=discord.File(part, filename)
+                )
+            )
+        # The manifest goes last, so its presence means every part made it
+        await discord_throttle.submit(('send', channel.id), lambda: channel.send(
+            f"**Log upload: {upload_name}**\n"
+            f"{len(parts)} part(s) of `{upload_name}.gz` ({size} bytes), sha256 `{digest}`\n"
+            f"Reassemble by concatenating the parts in order: `cat {upload_name}.gz.part* > {upload_name}.gz`"
+        ))
+    finally:
+        for part in parts:
+            os.remove(part)
+    return len(parts)
+
 async def upload_logs():
     if not log_upload_enabled:
         return
@@ -575,27 +2329,20 @@ async def upload_logs():
     current_date = datetime.now().strftime("%Y-%m-%d")
     log_file_name = f"bot_logs_{current_date}.txt"
     
-    # Close current file handler
-    for handler in logging.root.handlers[:]:
-        if isinstance(handler, logging.FileHandler):
-            handler.close()
-            logging.root.removeHandler(handler)
-    
-    if os.path.exists("bot_logs.txt"):
-        os.rename("bot_logs.txt", log_file_name)
-        
-        # Reinitialize logging
-        file_handler = logging.FileHandler("bot_logs.txt")
-        file_handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
-        logging.root.addHandler(file_handler)
+    if os.path.exists(log_file_handler.baseFilename):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, rotate_log_file, log_file_name)
+        except OSError as e:
+            logging.error(f"Failed to rotate log file for upload: {e}")
+            return
         
         # Upload log
         log_channel = bot.get_channel(LOG_CHANNEL_ID)
         if log_channel:
             try:
-                with open(log_file_name, "rb") as log_file:
-                    await log_channel.send(file=discord.File(log_file, log_file_name))
-                logging.info(f"Uploaded log file {log_file_name}")
+                parts = await ship_log_file(log_channel, log_file_name, log_file_name)
+                logging.info(f"Uploaded log file {log_file_name} in {parts} part(s)")
             except Exception as e:
                 logging.error(f"Failed to upload logs: {e}")
 
@@ -603,6 +2350,48 @@ async def upload_logs():
 async def schedule_log_upload():
     await upload_logs()
 
+# Background refresh of the user ID cache
+@tasks.loop(hours=1)
+async def refresh_user_cache():
+    """Re-resolve stale user cache entries by user ID in batches of 100"""
+    if not bot.state.twitch_connected:
+        return
+    
+    current_time = datetime.now().timestamp()
+    stale = [
+        (login, entry['user_id']) for login, entry in twitch_user_cache.items()
+        if current_time - entry.get('resolved_at', 0) > USER_CACHE_REFRESH_AGE
+    ]
+    if not stale:
+        return
+    
+    try:
+        for i in range(0, len(stale), TWITCH_BATCH_SIZE):
+            batch = dict(stale[i:i + TWITCH_BATCH_SIZE])
+            logins_by_id = {user_id: login for login, user_id in batch.items()}
+            async for user in stream_twitch_request(twitch.get_users, user_ids=list(logins_by_id)):
+                login = logins_by_id[user.id]
+                if user.login.lower() != login:
+                    logging.info(f"Twitch user {login} is now known as {user.login}")
+                cache_twitch_user(login, user)
+        save_user_cache()
+        logging.info(f"Refreshed {len(stale)} cached Twitch user IDs")
+    except Exception as e:
+        logging.error(f"Error refreshing Twitch user cache: {e}")
+
+# Flush notification state changes to disk
+@tasks.loop(seconds=5)
+async def checkpoint_notification_state():
+    if notification_state_dirty:
+        await save_notification_state()
+    if poll_scheduler.dirty:
+        await poll_scheduler.save()
+
+# Fold the watchlist journal back into twitch_usernames.json
+@tasks.loop(hours=1)
+async def compact_watchlist():
+    await TWITCH_USERNAMES.compact()
+
 # Message edit attempts cleanup
 @tasks.loop(hours=1)
 async def clean_message_attempts():
@@ -617,6 +2406,12 @@ async def clean_message_attempts():
     for key in keys_to_remove:
         del message_edit_attempts[key]
     
+    # Forget edit times/hashes for messages that are no longer tracked
+    tracked_ids = set(live_messages.values())
+    for message_id in [message_id for message_id in last_message_hashes if message_id not in tracked_ids]:
+        last_message_hashes.pop(message_id, None)
+        last_message_edit_time.pop(message_id, None)
+    
     logging.debug(f"Cleaned up {len(keys_to_remove)} old message edit attempts")
 
 # Command checks
@@ -746,8 +2541,11 @@ async def add_twitch_user(interaction: discord.Interaction, username: str):
     if view.value is None:
         await interaction.followup.send("Add user cancelled (timed out).", ephemeral=True)
     elif view.value:
-        TWITCH_USERNAMES.append(username)
-        save_twitch_usernames(TWITCH_USERNAMES)
+        try:
+            await TWITCH_USERNAMES.add(username)
+        except IOError:
+            await interaction.followup.send(f"Could not save {username} to the monitoring list, please try again.", ephemeral=True)
+            return
         await interaction.followup.send(
             f"Added {username} to monitoring list: https://twitch.tv/{username}",
             ephemeral=True
@@ -780,8 +2578,14 @@ async def remove_twitch_user(interaction: discord.Interaction, username: str):
     if view.value is None:
         await interaction.followup.send("Remove user cancelled (timed out).", ephemeral=True)
     elif view.value:
-        TWITCH_USERNAMES.remove(username)
-        save_twitch_usernames(TWITCH_USERNAMES)
+        try:
+            await TWITCH_USERNAMES.remove(username)
+        except IOError:
+            await interaction.followup.send(f"Could not save the removal of {username}, please try again.", ephemeral=True)
+            return
+        removed_user_cache_logins.add(username.lower())
+        if twitch_user_cache.pop(username.lower(), None):
+            save_user_cache()
         await interaction.followup.send(
             f"Removed {username} from monitoring list: https://twitch.tv/{username}",
             ephemeral=True
@@ -801,8 +2605,9 @@ async def list_twitch_users(interaction: discord.Interaction):
     # Split users into pages of 10
     users_per_page = 10
     pages = []
-    for i in range(0, len(TWITCH_USERNAMES), users_per_page):
-        page_users = TWITCH_USERNAMES[i:i + users_per_page]
+    usernames = list(TWITCH_USERNAMES)
+    for i in range(0, len(usernames), users_per_page):
+        page_users = usernames[i:i + users_per_page]
         pages.append(page_users)
     
     current_page = 0
@@ -985,12 +2790,25 @@ async def clear_twitch_bot_activity(interaction: discord.Interaction):
 async def check_new_twitch_live_stream(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     live_users = []
+    current_time = datetime.now().timestamp()
+    usernames = [username for username in TWITCH_USERNAMES if username]
+
+    # Reuse fresh statuses from the background poller, fetch the rest in one batched query
+    stale = [
+        username for username in usernames
+        if current_time - latest_statuses.get(username, {}).get('checked_at', 0) > MANUAL_CHECK_MAX_AGE
+    ]
+    fetched = await fetch_live_statuses(stale) if stale else {}
+    if fetched is None:
+        await interaction.followup.send("Could not reach Twitch, showing the last known status.", ephemeral=True)
+        fetched = {}
+    for username, stream_info in fetched.items():
+        latest_statuses[username] = {'stream_info': stream_info, 'checked_at': current_time}
 
-    # Check all users first
-    for username in TWITCH_USERNAMES:
-        stream_info = await is_user_live(username)
-        if stream_info.get('is_live'):
-            live_users.append((username, stream_info))
+    for username in usernames:
+        latest = latest_statuses.get(username)
+        if latest and latest['stream_info'].get('is_live'):
+            live_users.append((username, latest['stream_info'], latest['checked_at']))
 
     if not live_users:
         await interaction.followup.send("No users are currently live.", ephemeral=True)
@@ -1000,7 +2818,7 @@ async def check_new_twitch_live_stream(interaction: discord.Interaction):
     channel = bot.get_channel(DISCORD_CHANNEL_ID)
     posted_users = []
     
-    for username, stream_info in live_users:
+    for username, stream_info, checked_at in live_users:
         class UserConfirmView(discord.ui.View):
             def __init__(self, timeout=30):
                 super().__init__(timeout=timeout)
@@ -1067,6 +2885,7 @@ async def check_new_twitch_live_stream(interaction: discord.Interaction):
             url=f"https://twitch.tv/{username}",
             icon_url="https://cdn3.iconfinder.com/data/icons/social-media-2068/64/_极itch-512.png"
         )
+        user_embed.set_footer(text=f"Status checked {int(datetime.now().timestamp() - checked_at)}s ago")
         
         view = UserConfirmView(timeout=30)
         message = await interaction.followup.send(
@@ -1085,7 +2904,8 @@ async def check_new_twitch_live_stream(interaction: discord.Interaction):
         elif view.value:  # Post clicked
             try:
                 main_embed = create_stream_embed(username, stream_info, is_live=True)
-                await channel.send(f"@everyone **{username}** is live on Twitch!", embed=main_embed)
+                if not await safe_message_send(channel, f"@everyone **{username}** is live on Twitch!", embed=main_embed):
+                    raise Exception("message could not be sent")
                 posted_users.append(username)
                 logging.info(f"Manually posted live stream for {username}")
             except Exception as e:
@@ -1159,6 +2979,7 @@ async def twitch_bot_help(interaction: discord.Interaction):
 # Bot events
 @bot.event
 async def on_ready():
+    global eventsub_client
     logging.info(f"Logged in as {bot.user.name}")
     
     # Set default bot status and activity
@@ -1183,13 +3004,33 @@ async def on_ready():
     except Exception as e:
         logging.error(f"Failed to set default bot status: {e}")
     
-    # Initialize Twitch connection
-    if not await init_twitch():
-        await handle_connection_error()
+    bot.supervisor.report_success('discord')
+    
+    # The supervisor initializes the Twitch connection and rebuilds whatever fails later
+    if not hasattr(bot, 'supervisor_task') or bot.supervisor_task.done():
+        bot.supervisor_task = bot.loop.create_task(bot.supervisor.run())
+    
+    # Restore notification state once, before the first poll
+    if not hasattr(bot, 'live_status_task'):
+        restore_notification_state()
+        poll_scheduler.load()
     
     # Start monitoring tasks if they're not already running
-    if not hasattr(bot, 'live_status_task') or bot.l极_status_task.done():
-        bot.live_status_task = bot.loop.create_task(check_live_status())
+    if not hasattr(bot, 'live_status_task') or bot.live_status_task.done():
+        # In sharded mode the workers poll Twitch and this process only notifies
+        monitor = consume_shard_transitions() if SHARD_ROLE == 'notifier' else check_live_status()
+        bot.live_status_task = bot.loop.create_task(monitor)
+    
+    # Start EventSub push mode if configured; polling keeps running as the reconciler
+    if EVENTSUB_ENABLED:
+        if not TWITCH_USER_ACCESS_TOKEN:
+            logging.warning("TWITCH_EVENTSUB_ENABLED is set but TWITCH_USER_ACCESS_TOKEN is missing; using polling only")
+        elif not hasattr(bot, 'eventsub_task') or bot.eventsub_task.done():
+            eventsub_client = EventSubWebSocket(handle_eventsub_event)
+            bot.eventsub_task = bot.loop.create_task(eventsub_client.run())
+    
+    # Start the metrics endpoint
+    await start_metrics_server()
     
     # Start health check task
     if not check_connections.is_running():
@@ -1203,6 +3044,18 @@ async def on_ready():
     if not schedule_log_upload.is_running():
         schedule_log_upload.start()
     
+    # Start notification state checkpointing
+    if not checkpoint_notification_state.is_running():
+        checkpoint_notification_state.start()
+    
+    # Start user ID cache refresher
+    if not refresh_user_cache.is_running():
+        refresh_user_cache.start()
+    
+    # Start watchlist compaction task
+    if not compact_watchlist.is_running():
+        compact_watchlist.start()
+    
     # Start message attempts cleanup task
     if not clean_message_attempts.is_running():
         clean_message_attempts.start()
@@ -1225,9 +3078,13 @@ async def setup_hook():
 
 @bot.event
 async def on_disconnect():
-    bot.state.discord_connected = False
+    bot.supervisor.report_failure('discord', "gateway disconnected")
     logging.warning("Disconnected from Discord")
 
+@bot.event
+async def on_resumed():
+    bot.supervisor.report_success('discord')
+
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
     if isinstance(error, app_commands.CheckFailure):
@@ -1245,11 +3102,17 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-# Start bot
-try:
-    bot.run(DISCORD_TOKEN)
-except Exception as e:
-    logging.error(f"Bot crashed: {e}")
-    asyncio.run(asyncio.sleep(60))
-    python = sys.executable
-    os.execl(python, python, *sys.argv)
\ No newline at end of file
+# Start bot (importing the module, e.g. from the benchmark, doesn't start it)
+if __name__ == "__main__":
+    if SHARD_ROLE == 'worker':
+        # Shard workers only poll Twitch; the notifier process owns the Discord connection
+        asyncio.run(run_shard_worker())
+    else:
+        # Crashes are recovered in-process by start_discord; anything it raises is final
+        try:
+            asyncio.run(start_discord())
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            logging.critical(f"Bot stopped: {e}")
+            sys.exit(1)
\ No newline at end of file
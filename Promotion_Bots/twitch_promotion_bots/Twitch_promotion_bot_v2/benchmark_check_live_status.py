@@ -0,0 +1,453 @@
+"""Load benchmark for check_live_status against in-process fake Twitch and Discord backends.
+
+Runs the bot's real polling loop (check_live_status -> fetch_live_statuses ->
+apply_stream_status -> Discord outbound throttle) against local stand-ins for
+id.twitch.tv/Helix and the Discord REST API, and reports per watchlist size:
+
+- poll cycle time (p50 / p95 / max)
+- Helix requests per cycle
+- detect-to-post latency (a fake streamer going live -> its notification reaching Discord)
+- peak RSS of the benchmark process (the bot plus the fake backends)
+
+Every size runs in its own process so memory and module state don't carry over.
+Nothing real is contacted; the Discord gateway is skipped by handing the bot a
+partial channel instead of waiting for on_ready.
+
+Usage:
+    python benchmark_check_live_status.py
+    python benchmark_check_live_status.py --sizes 100 1000 --duration 30 --helix-latency 0.1 --discord-429 0.05
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHANNEL_ID = 1000
+
+
+def json_response(data, status=200, headers=None):
+    """JSON response without a charset: discord.py only decodes a Content-Type of exactly application/json,
+    and web.json_response's 'application/json; charset=utf-8' would hand it a str instead of a dict"""
+    # aiohttp appends a charset to any text= response, so the body goes in as bytes with an explicit header
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={'Content-Type': 'application/json', **(headers or {})})
+
+
+class FakeHelix:
+    """Stand-in for the Twitch token endpoint and the Helix users/streams/games endpoints"""
+    def __init__(self, size, live_ratio, latency, error_ratio):
+        self.logins = [f"streamer{i:05d}" for i in range(size)]
+        self.user_ids = {login: str(100000 + i) for i, login in enumerate(self.logins)}
+        self.logins_by_id = {user_id: login for login, user_id in self.user_ids.items()}
+        self.live = set(random.sample(self.logins, int(size * live_ratio)))
+        self.went_live_at = {}  # login -> monotonic time it went live during the run
+        self.latency = latency
+        self.error_ratio = error_ratio
+        self.requests = 0
+        self.rate_limited = 0
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post('/oauth2/token', self.token)
+        app.router.add_get('/helix/users', self.users)
+        app.router.add_get('/helix/streams', self.streams)
+        app.router.add_get('/helix/games', self.games)
+        return app
+
+    async def respond(self, data):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(random.uniform(self.latency / 2, self.latency * 1.5))
+        if random.random() < self.error_ratio:
+            self.rate_limited += 1
+            return json_response({'error': 'Too Many Requests', 'status': 429}, status=429, headers={'Ratelimit-Remaining': '0'})
+        return json_response({'data': data, 'pagination': {}})
+
+    def stream(self, login):
+        return {
+            'id': f"s{self.user_ids[login]}",
+            'user_id': self.user_ids[login],
+            'user_login': login,
+            'user_name': login,
+            'game_id': '509658',
+            'game_name': 'Just Chatting',
+            'type': 'live',
+            'title': f"{login} benchmark stream",
+            'viewer_count': random.randint(1, 5000),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'thumbnail_url': f"https://static-cdn.jtvnw.net/previews-ttv/live_user_{login}-{{width}}x{{height}}.jpg"
+        }
+
+    async def token(self, request):
+        return json_response({'access_token': 'benchmark', 'expires_in': 5000000, 'token_type': 'bearer'})
+
+    async def users(self, request):
+        logins = [login.lower() for login in request.query.getall('login', [])]
+        logins += [self.logins_by_id[user_id] for user_id in request.query.getall('id', []) if user_id in self.logins_by_id]
+        return await self.respond([
+            {'id': self.user_ids[login], 'login': login, 'display_name': login}
+            for login in logins if login in self.user_ids
+        ])
+
+    async def streams(self, request):
+        logins = [login.lower() for login in request.query.getall('user_login', [])]
+        logins += [self.logins_by_id.get(user_id) for user_id in request.query.getall('user_id', [])]
+        first = int(request.query.get('first', 20))
+        return await self.respond([self.stream(login) for login in logins if login in self.live][:first])
+
+    async def games(self, request):
+        return await self.respond([{'id': game_id, 'name': f"Game {game_id}"} for game_id in request.query.getall('id', [])])
+
+    def churn(self, count):
+        """Flip count streamers between live and offline, keeping the live ratio roughly stable"""
+        for _ in range(count):
+            if self.live and (random.random() < 0.5 or len(self.live) == len(self.logins)):
+                self.live.discard(random.choice(list(self.live)))
+            else:
+                self.go_live()
+
+    def go_live(self):
+        """Bring a random offline streamer live"""
+        login = random.choice([login for login in self.logins if login not in self.live])
+        self.live.add(login)
+        self.went_live_at[login] = time.monotonic()
+
+
+class FakeDiscord:
+    """Stand-in for the Discord REST endpoints the bot uses: login, send, edit and fetch message"""
+    ANNOUNCEMENT = re.compile(r"\*\*(\w+)\*\* is live on Twitch")
+
+    def __init__(self, helix, latency, error_ratio):
+        self.helix = helix
+        self.latency = latency
+        self.error_ratio = error_ratio
+        self.next_message_id = 10 ** 17
+        self.requests = 0
+        self.rate_limited = 0
+        self.sends = 0
+        self.edits = 0
+        self.post_latencies = []
+        self.user = {'id': '1', 'username': 'benchmark', 'discriminator': '0000', 'avatar': None, 'bot': True}
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/api/v10/users/@me', self.me)
+        app.router.add_post('/api/v10/channels/{channel_id}/messages', self.send)
+        app.router.add_patch('/api/v10/channels/{channel_id}/messages/{message_id}', self.edit)
+        app.router.add_get('/api/v10/channels/{channel_id}/messages/{message_id}', self.fetch)
+        return app
+
+    def new_message_id(self):
+        self.next_message_id += 1
+        return self.next_message_id
+
+    def message(self, message_id, channel_id, body):
+        return {
+            'id': str(message_id),
+            'channel_id': str(channel_id),
+            'author': self.user,
+            'content': body.get('content') or '',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': body.get('embeds') or [],
+            'pinned': False,
+            'type': 0
+        }
+
+    async def respond(self, data):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(random.uniform(self.latency / 2, self.latency * 1.5))
+        if random.random() < self.error_ratio:
+            self.rate_limited += 1
+            # discord.py only retries 429s that carry a Via header (otherwise it assumes a Cloudflare ban)
+            return json_response(
+                {'message': 'You are being rate limited.', 'retry_after': 0.05, 'global': False},
+                status=429,
+                headers={'Retry-After': '0.05', 'Via': '1.1 google', 'X-RateLimit-Scope': 'user'}
+            )
+        return json_response(data, headers={
+            'X-RateLimit-Limit': '50',
+            'X-RateLimit-Remaining': '49',
+            'X-RateLimit-Reset-After': '0.01',
+            'X-RateLimit-Bucket': 'benchmark'
+        })
+
+    async def me(self, request):
+        return json_response(self.user)
+
+    async def send(self, request):
+        body = await request.json()
+        response = await self.respond(self.message(self.new_message_id(), request.match_info['channel_id'], body))
+        if response.status == 200:
+            self.sends += 1
+            match = self.ANNOUNCEMENT.search(body.get('content') or '')
+            went_live_at = match and self.helix.went_live_at.pop(match.group(1), None)
+            if went_live_at:
+                self.post_latencies.append(time.monotonic() - went_live_at)
+        return response
+
+    async def edit(self, request):
+        body = await request.json()
+        response = await self.respond(self.message(request.match_info['message_id'], request.match_info['channel_id'], body))
+        if response.status == 200:
+            self.edits += 1
+        return response
+
+    async def fetch(self, request):
+        return await self.respond(self.message(request.match_info['message_id'], request.match_info['channel_id'], {}))
+
+
+async def serve(app):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def run_size(size, args):
+    helix = FakeHelix(size, args.live_ratio, args.helix_latency, args.helix_429)
+    discord_backend = FakeDiscord(helix, args.discord_latency, args.discord_429)
+    helix_runner, helix_url = await serve(helix.app())
+    discord_runner, discord_url = await serve(discord_backend.app())
+
+    # The bot reads its configuration at import time, and keeps its state files in the working directory
+    with open('twitch_usernames.json', 'w') as file:
+        json.dump(helix.logins, file)
+    os.environ.update({
+        'DISCORD_TOKEN': 'benchmark',
+        'TWITCH_CLIENT_ID': 'benchmark',
+        'TWITCH_CLIENT_SECRET': 'benchmark',
+        'DISCORD_CHANNEL_ID': str(CHANNEL_ID),
+        'ALLOWED_ROLE_IDS': '1',
+        'ALLOWED_CHANNEL_ID': str(CHANNEL_ID),
+        'LOG_CHANNEL_ID': str(CHANNEL_ID),
+        'GUILD_ID': '1',
+        'TWITCH_HELIX_URL': f"{helix_url}/helix",
+        'TWITCH_TOKEN_URL': f"{helix_url}/oauth2/token",
+        'TWITCH_EVENTSUB_ENABLED': 'false',
+        'TWITCH_SHARD_ROLE': '',
+        'TWITCH_METRICS_PORT': '0',
+        'LOG_QUEUE_ENABLED': 'false',
+        'DNS_FALLBACKS': ''
+    })
+    sys.path.insert(0, SCRIPT_DIR)
+    bot_module = importlib.import_module('Twitch_promotion_bot_v2')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    import discord
+    discord.http.Route.BASE = f"{discord_url}/api/v10"
+    bot = bot_module.bot
+
+    # Streams that are live at the start were announced before the run began
+    for login in helix.live:
+        stream = helix.stream(login)
+        bot_module.last_stream_info[login] = {
+            'is_live': True,
+            'key': f"{login}_{stream['title']}_{stream['game_name']}",
+            'title': stream['title'],
+            'game': stream['game_name']
+        }
+        bot_module.live_messages[login] = discord_backend.new_message_id()
+
+    # Poll back to back, and sample the cycle time and Helix traffic as each cycle finishes
+    bot_module.POLL_MIN_INTERVAL = args.interval
+    bot_module.poll_scheduler.min_interval = bot_module.poll_scheduler.max_interval = args.interval
+    cycles = []  # (cycle seconds, Helix requests so far)
+    observe = bot_module.metrics.observe
+
+    def record_cycle(name, value, **labels):
+        if name == 'twitch_poll_cycle_seconds':
+            cycles.append((value, helix.requests))
+        observe(name, value, **labels)
+    bot_module.metrics.observe = record_cycle
+
+    # Discord operations the bot gave up on (after discord.py's own retries)
+    errors = []
+    inc = bot_module.metrics.inc
+
+    def record_operation(name, value=1, **labels):
+        if name == 'discord_operations_total' and labels.get('result') == 'error':
+            errors.append(labels.get('operation'))
+        inc(name, value, **labels)
+    bot_module.metrics.inc = record_operation
+
+    async with bot:
+        await bot.http.static_login('benchmark')
+        # No gateway: a partial channel is all the notify/edit path needs
+        bot.get_channel = bot.get_partial_messageable
+
+        async def ready():
+            return None
+        bot.wait_until_ready = ready
+
+        await bot_module.init_twitch()
+        bot.supervisor.report_success('twitch')
+        poller = asyncio.create_task(bot_module.check_live_status())
+
+        # The first cycle resolves every login; measure from the cycle after
+        while len(cycles) < max(1, args.warmup_cycles):
+            await asyncio.sleep(0.05)
+        warm_cycles = len(cycles)
+        # At least one announcement is always expected, so zero sends means the Discord path is broken
+        if len(helix.live) < size:
+            helix.go_live()
+
+        changes_per_second = size * args.churn / 60
+        carry = 0.0
+        started = time.monotonic()
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(1)
+            carry += changes_per_second
+            helix.churn(int(carry))
+            carry -= int(carry)
+
+        # Let queued Discord operations finish before reading the results
+        drain_deadline = time.monotonic() + args.drain
+        while bot_module.discord_throttle.queue_depth and time.monotonic() < drain_deadline:
+            await asyncio.sleep(0.1)
+        poller.cancel()
+        await asyncio.gather(poller, return_exceptions=True)
+        await bot_module.twitch.close()
+
+    await helix_runner.cleanup()
+    await discord_runner.cleanup()
+
+    measured = cycles[warm_cycles:]
+    cycle_times = [duration for duration, _ in measured]
+    request_counts = [count for _, count in cycles[warm_cycles - 1:]]
+    helix_per_cycle = [later - earlier for earlier, later in zip(request_counts, request_counts[1:])]
+    return {
+        'size': size,
+        'cycles': len(measured),
+        'cycle_p50': percentile(cycle_times, 0.5),
+        'cycle_p95': percentile(cycle_times, 0.95),
+        'cycle_max': max(cycle_times) if cycle_times else None,
+        'helix_per_cycle': statistics.mean(helix_per_cycle) if helix_per_cycle else None,
+        'helix_429': helix.rate_limited,
+        'discord_sends': discord_backend.sends,
+        'discord_edits': discord_backend.edits,
+        'discord_429': discord_backend.rate_limited,
+        'discord_errors': len(errors),
+        'posts_measured': len(discord_backend.post_latencies),
+        'not_posted': len(helix.went_live_at),
+        'post_p50': percentile(discord_backend.post_latencies, 0.5),
+        'post_p95': percentile(discord_backend.post_latencies, 0.95),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def run_child(size, args):
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as work_dir:
+        os.chdir(work_dir)
+        try:
+            result = asyncio.run(run_size(size, args))
+        finally:
+            os.chdir(original_dir)
+    print(json.dumps(result))
+    # A run that posted nothing or lost operations measured a broken bot, not a slow one
+    if result['discord_sends'] == 0 or result['discord_errors'] > 0:
+        print(f"Benchmark for {size} streamers is invalid: {result['discord_sends']} Discord sends, "
+              f"{result['discord_errors']} failed Discord operations", file=sys.stderr)
+        sys.exit(1)
+
+
+def format_value(value, unit=''):
+    if value is None:
+        return '-'
+    return f"{value:.3f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help="watchlist sizes to benchmark")
+    parser.add_argument('--duration', type=float, default=60, help="seconds to measure per size, after warm-up")
+    parser.add_argument('--warmup-cycles', type=int, default=2, help="poll cycles to run before measuring")
+    parser.add_argument('--interval', type=float, default=0, help="seconds between poll cycles (the bot uses 30)")
+    parser.add_argument('--drain', type=float, default=30, help="max seconds to wait for queued Discord operations at the end")
+    parser.add_argument('--live-ratio', type=float, default=0.1, help="fraction of streamers live at any time")
+    parser.add_argument('--churn', type=float, default=0.005, help="fraction of streamers changing live state per minute")
+    parser.add_argument('--helix-latency', type=float, default=0.05, help="mean Helix response latency in seconds")
+    parser.add_argument('--discord-latency', type=float, default=0.05, help="mean Discord response latency in seconds")
+    parser.add_argument('--helix-429', type=float, default=0.0, help="fraction of Helix requests answered with 429")
+    parser.add_argument('--discord-429', type=float, default=0.0, help="fraction of Discord requests answered with 429")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.child is not None:
+        run_child(args.child, args)
+        return
+
+    results = []
+    failed = []
+    for size in args.sizes:
+        print(f"Benchmarking {size} streamers...", file=sys.stderr)
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *sys.argv[1:], '--child', str(size)],
+            stdout=subprocess.PIPE, text=True
+        )
+        if child.returncode != 0:
+            print(f"Benchmark for {size} streamers failed (exit code {child.returncode})", file=sys.stderr)
+            failed.append(size)
+            continue
+        results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    columns = [
+        ('size', 'streamers', ''), ('cycles', 'cycles', ''),
+        ('cycle_p50', 'cycle p50', 's'), ('cycle_p95', 'cycle p95', 's'), ('cycle_max', 'cycle max', 's'),
+        ('helix_per_cycle', 'helix/cycle', ''), ('discord_sends', 'sends', ''), ('discord_edits', 'edits', ''),
+        ('post_p50', 'post p50', 's'), ('post_p95', 'post p95', 's'), ('not_posted', 'unposted', ''),
+        ('helix_429', 'helix 429', ''), ('discord_429', 'discord 429', ''), ('discord_errors', 'discord errors', ''),
+        ('peak_rss_mb', 'peak RSS', 'MB')
+    ]
+    rows = [[title for _, title, _ in columns]]
+    rows += [[format_value(result[key], unit) for key, _, unit in columns] for result in results]
+    widths = [max(len(row[index]) for row in rows) for index in range(len(columns))]
+    for row in rows:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+    if failed:
+        sys.exit(f"Benchmark failed for {', '.join(map(str, failed))} streamers")
+
+
+if __name__ == "__main__":
+    main()
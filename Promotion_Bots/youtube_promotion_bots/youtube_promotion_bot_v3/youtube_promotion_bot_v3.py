@@ -10,14 +10,18 @@ from discord import app_commands, Status, Activity, ActivityType
 import asyncio
 import os
 import json
+import hashlib
+import zlib
 from dotenv import load_dotenv
 import feedparser  # For parsing RSS feeds
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from queue import Queue, Full
+import atexit
 import sys
-import requests  # For making HTTP requests to the YouTube API
+import aiohttp  # For making HTTP requests to the YouTube API
 from datetime import datetime
-from ratelimit import limits, sleep_and_retry
+from zoneinfo import ZoneInfo
 import time
 
 # Load environment variables
@@ -36,8 +40,16 @@ if not YOUTUBE_API_KEYS or not all(YOUTUBE_API_KEYS):
     print("Error: No valid YouTube API keys found in the .env file.")
     sys.exit(1)
 
-# Track the current API key index
-current_api_key_index = 0
+# YouTube Data API base URL and channel RSS feed URL
+YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3"
+YOUTUBE_RSS_URL = "https://www.youtube.com/feeds/videos.xml"
+
+# Most video IDs a single videos.list request accepts
+VIDEOS_LIST_MAX_IDS = 50
+
+# Quota units each YouTube Data API operation costs. Daily quotas reset at midnight Pacific time.
+QUOTA_COSTS = {"search": 100, "videos": 1}
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
 
 # Global variable to track if daily logs are enabled
 daily_logs_enabled = True
@@ -65,6 +77,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 # File to store monitored channels
 MONITORED_CHANNEL_FILE = os.path.join(SCRIPT_DIR, "monitored_channels.json")
 
+# File to store the quota units each API key spent today
+API_QUOTA_FILE = os.path.join(SCRIPT_DIR, "api_quota_ledger.json")
+
 # Configuration file for allowed roles
 CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
 
@@ -74,6 +89,10 @@ LOG_FILE = os.path.join(SCRIPT_DIR, "logs", "bot_activity.log")
 # Create the logs directory if it doesn't exist
 os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 
+# Daily log uploads are gzipped and split into parts below Discord's attachment limit
+LOG_UPLOAD_PART_SIZE = 8 * 1024 * 1024  # bytes
+LOG_UPLOAD_CHUNK_SIZE = 64 * 1024  # bytes read and compressed at a time
+
 # Load configuration from file
 def load_config():
     if os.path.exists(CONFIG_FILE):
@@ -84,6 +103,38 @@ def load_config():
 config = load_config()
 allowed_roles = config.get("allowed_roles", {})
 
+# Feed fetching: number of workers, the shared fetch rate (FETCH_WORKERS feeds per FETCH_DELAY seconds)
+# and time budget of a check
+monitoring_settings = config.get("monitoring_settings", {})
+FETCH_WORKERS = max(1, monitoring_settings.get("batch_size", 5))
+FETCH_DELAY = monitoring_settings.get("delay_between_batches", 2)
+CHECK_TIME_BUDGET = monitoring_settings.get("check_time_budget", 20)
+
+# Channels whose feeds weren't fetched within the last check's budget, fetched first in the next one
+rolled_over_channels = []
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue: when it is full records are dropped and counted instead of blocking"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported = 0
+
+    def enqueue(self, record):
+        if self.dropped > self.reported:
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"Log queue full, dropped {self.dropped - self.reported} log records"
+                }))
+                self.reported = self.dropped
+            except Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
 # Set up logging with UTF-8 encoding
 def setup_logging():
     log_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
@@ -96,14 +147,25 @@ def setup_logging():
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(log_formatter)
 
+    handlers = [file_handler, console_handler]
+    logging_settings = config.get("logging_settings", {})
+    if logging_settings.get("queue_enabled", False):
+        # Disk writes and rotation happen on the listener thread instead of the event loop
+        log_queue = Queue(maxsize=logging_settings.get("queue_size", 10000))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        handlers = [DroppingQueueHandler(log_queue)]
+
     # Configure the root logger
     logging.basicConfig(
         level=logging.INFO,
-        handlers=[file_handler, console_handler]
+        handlers=handlers
     )
+    return file_handler
 
 # Call the setup_logging function at the start of your script
-setup_logging()
+log_file_handler = setup_logging()
 log = logging.getLogger(__name__)
 
 # Log actions to a file
@@ -153,6 +215,12 @@ class Client(commands.Bot):
         # Start the daily log task
         send_daily_log.start()
 
+    async def close(self):
+        save_quota_ledger()
+        await youtube_api.close()
+        await rss_feeds.close()
+        await super().close()
+
     async def update_monitored_count_status(self):
         """Update the bot's status to show monitored channels count"""
         channel_count = len(monitored_channels)
@@ -167,90 +235,292 @@ intents = discord.Intents.default()
 intents.message_content = True
 client = Client(command_prefix="/", intents=intents)
 
-# Function to rotate YouTube API keys
-def rotate_api_key():
-    global current_api_key_index
-    current_api_key_index = (current_api_key_index + 1) % len(YOUTUBE_API_KEYS)
-    log.info(f"Rotated to YouTube API key index: {current_api_key_index}")
-    return YOUTUBE_API_KEYS[current_api_key_index]
-
-# Rate-limited function to verify if a video is a live stream using YouTube API
-@sleep_and_retry
-@limits(calls=10, period=1)  # 10 requests per second
-def verify_live_stream(video_id: str) -> bool:
-    global current_api_key_index
-    max_retries = len(YOUTUBE_API_KEYS)  # Maximum retries based on the number of keys
-
-    for _ in range(max_retries):
+class APIKeyScheduler:
+    """Picks the YouTube API key for each request from a ledger of the quota units each key spent
+    since the last reset. The least used key that can afford the request wins, and keys within
+    reserve_units of their daily limit are skipped before YouTube starts refusing them."""
+    def __init__(self, keys, quota_settings, path):
+        self.keys = keys
+        self.daily_limit = quota_settings.get("daily_limit_per_key", 10000)
+        self.reserve = quota_settings.get("reserve_units", 100)
+        self.path = path
+        self.dirty = False
+        # Keys that are no longer configured are dropped from the ledger
+        key_ids = {self.key_id(key) for key in keys}
+        self.ledger = {key_id: entry for key_id, entry in self.load().items() if key_id in key_ids}  # Format: {key_id: {"day": "YYYY-MM-DD", "units": {operation: units}, "exhausted": bool}}
+
+    @staticmethod
+    def key_id(api_key: str) -> str:
+        # The ledger stores a hash of each key, never the key itself
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def quota_day() -> str:
+        return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def load(self):
         try:
-            # Get the current API key
-            api_key = YOUTUBE_API_KEYS[current_api_key_index]
-
-            # Make a request to the YouTube Data API
-            url = f"https://www.googleapis.com/youtube/v3/videos?part=liveStreamingDetails&id={video_id}&key={api_key}"
-            response = requests.get(url)
-            data = response.json()
-
-            # Check for quota exhaustion error
-            if "error" in data:
-                error_message = data["error"].get("message", "")
-                if "quotaExceeded" in error_message:
-                    log.warning(f"Quota exceeded for API key index {current_api_key_index}. Rotating to the next key.")
-                    rotate_api_key()
-                    continue  # Retry with the next key
-
-            # Check if the video has live streaming details
-            if "items" in data and data["items"]:
-                live_details = data["items"][0].get("liveStreamingDetails", {})
-                if live_details:
-                    # Check if the stream is currently live
-                    return True
-            return False
-        except Exception as e:
-            log.error(f"Error verifying live stream with YouTube API: {e}")
-            log_action(f"Error verifying live stream with YouTube API: {e}")
-            return False
+            with open(self.path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            log.error(f"Could not read the API quota ledger, starting a new one: {e}")
+            return {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        # Written to a temporary file first so a crash can't leave a truncated ledger
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.ledger, file, indent=4)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def entry(self, index: int) -> dict:
+        """Ledger entry of a key for the current quota day, starting a fresh one after the reset"""
+        key_id = self.key_id(self.keys[index])
+        today = self.quota_day()
+        entry = self.ledger.get(key_id)
+        if entry is None or entry["day"] != today:
+            if entry is not None:
+                log.info(f"Daily quota reset for YouTube API key index {index}")
+            entry = self.ledger[key_id] = {"day": today, "units": {}, "exhausted": False}
+            self.dirty = True
+        return entry
+
+    def spent(self, index: int) -> int:
+        return sum(self.entry(index)["units"].values())
+
+    def charge(self, index: int, operation: str):
+        entry = self.entry(index)
+        entry["units"][operation] = entry["units"].get(operation, 0) + QUOTA_COSTS.get(operation, 1)
+        self.dirty = True
+
+    def acquire(self, operation: str):
+        """Charge a request to the least used key that can afford it. Returns the key's index, or None if none can"""
+        cost = QUOTA_COSTS.get(operation, 1)
+        usable = [
+            index for index in range(len(self.keys))
+            if not self.entry(index)["exhausted"] and self.spent(index) + cost <= self.daily_limit - self.reserve
+        ]
+        if not usable:
+            return None
+        index = min(usable, key=self.spent)
+        self.charge(index, operation)
+        return index
+
+    def mark_exhausted(self, index: int):
+        """YouTube refused the key for quota: skip it until the reset, whatever the ledger says"""
+        self.entry(index)["exhausted"] = True
+        self.dirty = True
+
+    def summary(self) -> str:
+        lines = []
+        for index in range(len(self.keys)):
+            entry = self.entry(index)
+            units = ", ".join(f"{operation} {spent}" for operation, spent in sorted(entry["units"].items())) or "unused"
+            state = ", exhausted" if entry["exhausted"] else ""
+            lines.append(f"Key {index + 1}: {self.spent(index)}/{self.daily_limit} units ({units}{state})")
+        return "\n".join(lines)
+
+key_scheduler = APIKeyScheduler(YOUTUBE_API_KEYS, config.get("quota_settings", {}), API_QUOTA_FILE)
+
+# Save the quota ledger if it changed
+def save_quota_ledger():
+    try:
+        key_scheduler.save()
+    except OSError as e:
+        log.error(f"Failed to save the API quota ledger: {e}")
+
+# True if a YouTube API response is a quota exhaustion error
+def is_quota_error(data):
+    error = data.get("error") if isinstance(data, dict) else None
+    if not error:
+        return False
+    reasons = [item.get("reason") for item in error.get("errors", [])]
+    return "quotaExceeded" in reasons or "quotaExceeded" in error.get("message", "")
+
+class YouTubeAPIClient:
+    """Async YouTube Data API client: one pooled keep-alive session, per-request timeouts,
+    a cap on concurrent requests and a requests-per-second limit"""
+    def __init__(self, network_settings):
+        self.timeout = network_settings.get("timeout", 30)
+        self.connect_timeout = network_settings.get("dns_timeout", 5)
+        self.max_concurrent = network_settings.get("max_concurrent_requests", 8)
+        self.interval = 1 / network_settings.get("requests_per_second", 10)
+        self.session = None
+        self.semaphore = None
+        self.next_slot = 0.0
+
+    async def get_session(self):
+        # Created on first use so the session belongs to the bot's event loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_concurrent, ttl_dns_cache=300)
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self.session
+
+    async def throttle(self):
+        # Space requests out to the configured rate without blocking the event loop
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def fetch(self, endpoint: str, params: dict, api_key: str, timeout: float = None):
+        """Make one request with the given key. Returns (HTTP status, JSON body)"""
+        session = await self.get_session()
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with self.semaphore:
+            await self.throttle()
+            async with session.get(f"{YOUTUBE_API_URL}/{endpoint}", params={**params, "key": api_key}, **kwargs) as response:
+                return response.status, await response.json(content_type=None)
+
+    async def get(self, endpoint: str, params: dict):
+        """Request an endpoint with the key the scheduler picks, moving to another key on quota errors.
+        Returns the JSON body, or None when no key has quota left for it"""
+        for _ in range(len(YOUTUBE_API_KEYS)):
+            index = key_scheduler.acquire(endpoint)
+            if index is None:
+                break
+            _, data = await self.fetch(endpoint, params, YOUTUBE_API_KEYS[index])
+            if is_quota_error(data):
+                log.warning(f"Quota exceeded for API key index {index}. Skipping it until the daily reset.")
+                key_scheduler.mark_exhausted(index)
+                continue
+            return data
+
+        log.error(f"No YouTube API key has quota left for {endpoint} until the reset at midnight Pacific time.")
+        return None
 
-    log.error("All YouTube API keys have exceeded their quota.")
-    return False
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
 
-# Fetch latest video or live stream using RSS feed
-def fetch_latest_content_rss(channel_id):
+youtube_api = YouTubeAPIClient(config.get("network_settings", {}))
+
+# Return the IDs in one videos.list batch that are live streams according to the YouTube API
+async def verify_live_stream_batch(video_ids: list) -> set:
     try:
-        rss_url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-        feed = feedparser.parse(rss_url)
-        if feed.entries:
-            latest_entry = feed.entries[0]
-            title = latest_entry.title.lower()
-            description = latest_entry.description.lower() if hasattr(latest_entry, "description") else ""
+        data = await youtube_api.get("videos", {
+            "part": "liveStreamingDetails",
+            "id": ",".join(video_ids),
+            "fields": "items(id,liveStreamingDetails)"
+        })
+        if not data:
+            return set()
+
+        # Videos with live streaming details are live streams
+        return {item["id"] for item in data.get("items", []) if item.get("liveStreamingDetails")}
+    except Exception as e:
+        log.error(f"Error verifying live streams with YouTube API: {e}")
+        log_action(f"Error verifying live streams with YouTube API: {e}")
+        return set()
+
+# Verify which videos are live streams, asking about up to VIDEOS_LIST_MAX_IDS videos per request
+async def verify_live_streams(video_ids) -> set:
+    video_ids = list(dict.fromkeys(video_ids))  # Drop duplicates, keep order
+    batches = [video_ids[i:i + VIDEOS_LIST_MAX_IDS] for i in range(0, len(video_ids), VIDEOS_LIST_MAX_IDS)]
+    results = await asyncio.gather(*(verify_live_stream_batch(batch) for batch in batches))
+    return set().union(*results)
+
+class RSSFeedClient:
+    """Fetches channel RSS feeds with conditional requests. Each feed's ETag, Last-Modified
+    and body hash are kept with the content parsed from it, so an unchanged feed costs a
+    304 (or a hash) instead of a download and parse"""
+    def __init__(self, network_settings):
+        self.timeout = network_settings.get("timeout", 30)
+        self.connect_timeout = network_settings.get("dns_timeout", 5)
+        self.session = None
+        self.feeds = {}  # Format: {channel_id: {"etag": str, "last_modified": str, "digest": str, "content": dict}}
+
+    async def get_session(self):
+        # Created on first use so the session belongs to the bot's event loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                connector=aiohttp.TCPConnector(ttl_dns_cache=300)
+            )
+        return self.session
+
+    async def get_latest(self, channel_id: str, parse):
+        """Return the content parsed from a channel's feed. parse(body) is only awaited when the feed changed"""
+        state = self.feeds.get(channel_id)
+        headers = {}
+        if state and state["etag"]:
+            headers["If-None-Match"] = state["etag"]
+        if state and state["last_modified"]:
+            headers["If-Modified-Since"] = state["last_modified"]
+
+        session = await self.get_session()
+        async with session.get(YOUTUBE_RSS_URL, params={"channel_id": channel_id}, headers=headers) as response:
+            if response.status == 304 and state:
+                return state["content"]
+            response.raise_for_status()
+            body = await response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        # Servers that ignore the validators still send identical bytes for an unchanged feed
+        digest = hashlib.sha256(body).hexdigest()
+        if state and digest == state["digest"]:
+            content = state["content"]
+        else:
+            content = await parse(body)
+        # Only stored once parsing succeeded, so a failed parse is retried on the next check
+        self.feeds[channel_id] = {"etag": etag, "last_modified": last_modified, "digest": digest, "content": content}
+        return content
 
-            # Method 1: Keyword-based detection
-            keyword_check = any(keyword in title or keyword in description for keyword in ["live", "premiere", "stream", "livestream"])
+    def forget(self, channel_id: str):
+        self.feeds.pop(channel_id, None)
 
-            # Method 2: Check for yt:liveBroadcast tag
-            live_broadcast_check = hasattr(latest_entry, "yt_livebroadcast") and latest_entry.yt_livebroadcast == "live"
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
 
-            # Method 3: Check for media:group and media:live tags
-            media_live_check = hasattr(latest_entry, "media_group") and hasattr(latest_entry.media_group, "media_live")
+rss_feeds = RSSFeedClient(config.get("network_settings", {}))
 
-            # Method 4: Check for yt:duration tag (assume live streams are longer than 1 hour)
-            duration = int(latest_entry.yt_duration) if hasattr(latest_entry, "yt_duration") else 0
-            duration_check = duration > 3600
+# Parse a downloaded RSS feed into the latest video or live stream
+async def parse_latest_entry(body: bytes):
+    # Parsing is CPU work, keep it off the event loop
+    feed = await asyncio.get_running_loop().run_in_executor(None, feedparser.parse, body)
+    if feed.entries:
+        latest_entry = feed.entries[0]
+        title = latest_entry.title.lower()
+        description = latest_entry.description.lower() if hasattr(latest_entry, "description") else ""
 
-            # Method 5: Combine all methods
-            is_live = keyword_check or live_broadcast_check or media_live_check or duration_check
+        # Method 1: Keyword-based detection
+        keyword_check = any(keyword in title or keyword in description for keyword in ["live", "premiere", "stream", "livestream"])
 
-            # If RSS feed suggests it's a live stream, verify with YouTube API
-            if is_live:
-                video_id = latest_entry.yt_videoid
-                is_live = verify_live_stream(video_id)
+        # Method 2: Check for yt:liveBroadcast tag
+        live_broadcast_check = hasattr(latest_entry, "yt_livebroadcast") and latest_entry.yt_livebroadcast == "live"
 
-            return {
-                "id": {"videoId": latest_entry.yt_videoid},
-                "snippet": {"title": latest_entry.title},
-                "is_live": is_live
-            }
-        return None
+        # Method 3: Check for media:group and media:live tags
+        media_live_check = hasattr(latest_entry, "media_group") and hasattr(latest_entry.media_group, "media_live")
+
+        # Method 4: Check for yt:duration tag (assume live streams are longer than 1 hour)
+        duration = int(latest_entry.yt_duration) if hasattr(latest_entry, "yt_duration") else 0
+        duration_check = duration > 3600
+
+        # Method 5: Combine all methods. Candidates are verified with the YouTube API by check_youtube
+        live_candidate = keyword_check or live_broadcast_check or media_live_check or duration_check
+
+        return {
+            "id": {"videoId": latest_entry.yt_videoid},
+            "snippet": {"title": latest_entry.title},
+            "live_candidate": live_candidate
+        }
+    return None
+
+# Fetch latest video or live stream using RSS feed
+async def fetch_latest_content_rss(channel_id):
+    try:
+        return await rss_feeds.get_latest(channel_id, parse_latest_entry)
     except Exception as e:
         log.error(f"RSS feed error: {e}")
         log_action(f"RSS feed error: {e}")
@@ -268,12 +538,96 @@ class WatchVideoButton(discord.ui.View):
         super().__init__()
         self.add_item(discord.ui.Button(label="Watch Video", url=url))
 
+class FeedRateLimiter:
+    """Token bucket shared by all feed fetch workers: up to burst feeds at once, then rate feeds per
+    second in total, however many workers are waiting and however long each fetch takes."""
+    def __init__(self, rate, burst):
+        self.rate = rate  # None = unlimited
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def capacity(self, seconds):
+        """Most feeds that can start within seconds, starting from a full bucket"""
+        return None if self.rate is None else int(self.burst + self.rate * seconds)
+
+    async def acquire(self):
+        if self.rate is None:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+feed_rate_limiter = FeedRateLimiter(FETCH_WORKERS / FETCH_DELAY if FETCH_DELAY > 0 else None, FETCH_WORKERS)
+
+# Fetch the latest content of channels with FETCH_WORKERS concurrent workers, started at the shared rate
+# of feed_rate_limiter. Returns the contents by channel ID and the channels not fetched within the budget.
+async def fetch_latest_contents(channel_ids: list, budget: float):
+    contents = {}
+    pending = iter(channel_ids)  # Shared by the workers, each channel is taken once
+
+    async def worker():
+        for channel_id in pending:
+            await feed_rate_limiter.acquire()
+            contents[channel_id] = await fetch_latest_content_rss(channel_id)
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(FETCH_WORKERS, len(channel_ids)))]
+    if workers:
+        # Fetches still running at the deadline are cancelled and roll over with the channels not started
+        _, unfinished = await asyncio.wait(workers, timeout=budget)
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+
+    missed = [channel_id for channel_id in channel_ids if channel_id not in contents]
+    return contents, missed
+
 # Background task to check for new videos and live streams
 @tasks.loop(seconds=30)  # Check every 30 seconds for near real-time monitoring
 async def check_youtube():
-    # Run checks in parallel
-    tasks = [check_channel(channel_id, data) for channel_id, data in monitored_channels.items()]
-    await asyncio.gather(*tasks)
+    global rolled_over_channels
+
+    # Channels that missed the last check's budget go first
+    order = [channel_id for channel_id in rolled_over_channels if channel_id in monitored_channels]
+    first = set(order)
+    order += [channel_id for channel_id in monitored_channels if channel_id not in first]
+
+    contents, rolled_over_channels = await fetch_latest_contents(order, CHECK_TIME_BUDGET)
+    if rolled_over_channels:
+        capacity = feed_rate_limiter.capacity(CHECK_TIME_BUDGET)
+        limit = f" (batch_size and delay_between_batches allow about {capacity} feeds per check)" if capacity is not None else ""
+        log.warning(f"{len(rolled_over_channels)} of {len(order)} channel(s) not checked within {CHECK_TIME_BUDGET}s{limit}, "
+                    f"they go first in the next check")
+
+    # Verify every new live stream candidate of this check together, in batched videos.list calls.
+    # IDs already recorded for the channel were classified when first seen, so they cost no quota:
+    # known streams count as live again (the handler skips them), known videos stay videos.
+    live_ids = set()
+    candidates = []
+    for channel_id, content in contents.items():
+        if not (content and content["live_candidate"] and channel_id in monitored_channels):
+            continue
+        content_id = content["id"]["videoId"]
+        data = monitored_channels[channel_id]
+        if any(stream["id"] == content_id for stream in data["streams"]):
+            live_ids.add(content_id)
+        elif not any(video["id"] == content_id for video in data["videos"]):
+            candidates.append(content_id)
+    if candidates:
+        live_ids |= await verify_live_streams(candidates)
+
+    # Hand each channel's content to the live stream or video handler
+    await asyncio.gather(*(
+        check_channel(channel_id, monitored_channels[channel_id], content, live_ids)
+        for channel_id, content in contents.items() if content and channel_id in monitored_channels
+    ))
+
+    save_quota_ledger()
 
 # Modularized function to handle live streams
 async def handle_live_stream(channel_id, data, content_id, content_title, content_url):
@@ -329,24 +683,20 @@ async def handle_uploaded_video(channel_id, data, content_id, content_title, con
             return {"type": "video", "channel_name": data["name"], "title": content_title, "url": content_url}
     return None
 
-# Check a single channel for new videos or live streams
-async def check_channel(channel_id, data):
+# Notify about a channel's latest content if it is a new video or live stream
+async def check_channel(channel_id, data, latest_content, live_ids):
     try:
-        # Check for new content (video or live stream)
-        latest_content = fetch_latest_content_rss(channel_id)
-
-        if latest_content:
-            content_id = latest_content["id"]["videoId"]
-            content_title = latest_content["snippet"]["title"]
-            is_live = latest_content["is_live"]
-            content_url = f"https://www.youtube.com/watch?v={content_id}"
-
-            # Check if it's a live stream
-            if is_live:
-                return await handle_live_stream(channel_id, data, content_id, content_title, content_url)
-            else:
-                # It's a regular video
-                return await handle_uploaded_video(channel_id, data, content_id, content_title, content_url)
+        content_id = latest_content["id"]["videoId"]
+        content_title = latest_content["snippet"]["title"]
+        is_live = content_id in live_ids
+        content_url = f"https://www.youtube.com/watch?v={content_id}"
+
+        # Check if it's a live stream
+        if is_live:
+            return await handle_live_stream(channel_id, data, content_id, content_title, content_url)
+        else:
+            # It's a regular video
+            return await handle_uploaded_video(channel_id, data, content_id, content_title, content_url)
 
     except Exception as e:
         log.error(f"Error checking channel {channel_id}: {e}")
@@ -372,6 +722,94 @@ async def on_app_command_error(interaction: discord.Interaction, error: app_comm
             ephemeral=True
         )
 
+# Move the live log aside; the file handler reopens a fresh LOG_FILE on the next record
+def rotate_log_file(archive_path):
+    log_file_handler.acquire()
+    try:
+        if log_file_handler.stream:
+            log_file_handler.stream.close()
+            log_file_handler.stream = None
+        os.replace(LOG_FILE, archive_path)
+    finally:
+        log_file_handler.release()
+
+# Gzip a file into <path>.gz.partNNN files of at most part_size bytes, in a worker thread.
+# The file is streamed in chunks, so memory use doesn't depend on its size. The parts are
+# one gzip stream split by bytes: concatenated in order they form the .gz file.
+def compress_log_parts(path, part_size=LOG_UPLOAD_PART_SIZE):
+    parts = []
+    digest = hashlib.sha256()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    current = None
+    size = 0
+
+    def write(data):
+        nonlocal current, size
+        while data:
+            if current is None or current.tell() >= part_size:
+                if current:
+                    current.close()
+                parts.append(f"{path}.gz.part{len(parts) + 1:03d}")
+                current = open(parts[-1], "wb")
+            piece = data[:part_size - current.tell()]
+            current.write(piece)
+            digest.update(piece)
+            size += len(piece)
+            data = data[len(piece):]
+
+    try:
+        with open(path, "rb") as source:
+            while chunk := source.read(LOG_UPLOAD_CHUNK_SIZE):
+                write(compressor.compress(chunk))
+        write(compressor.flush())
+    except Exception:
+        for part in parts:
+            if os.path.exists(part):
+                os.remove(part)
+        raise
+    finally:
+        if current:
+            current.close()
+    return parts, size, digest.hexdigest()
+
+# Send a message, retrying rate limits and server errors without blocking the event loop
+async def send_with_retry(channel, content, file_path=None, filename=None):
+    network_settings = config.get("network_settings", {})
+    max_retries = network_settings.get("max_retries", 3)
+    retry_delay = network_settings.get("retry_delay", 5)
+
+    for attempt in range(max_retries):
+        kwargs = {}
+        if file_path:
+            # A fresh File per attempt, since a failed upload consumes it
+            kwargs["file"] = discord.File(file_path, filename=filename)
+        try:
+            return await channel.send(content, **kwargs)
+        except discord.HTTPException as e:
+            if attempt == max_retries - 1 or (e.status != 429 and e.status < 500):
+                raise
+            delay = getattr(e, "retry_after", None) or retry_delay * (attempt + 1)
+            log.warning(f"Send to channel {channel.id} failed ({e.status}), retrying in {delay}s (attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+
+# Upload a file gzipped, in attachment-sized parts, followed by a manifest. Returns the number of parts.
+async def ship_log_file(channel, path, upload_name, title):
+    parts, size, digest = await asyncio.get_running_loop().run_in_executor(None, compress_log_parts, path)
+    try:
+        for index, part in enumerate(parts, 1):
+            await send_with_retry(channel, f"{upload_name} part {index}/{len(parts)}", part, f"{upload_name}.gz.part{index:03d}")
+        # The manifest goes last, so its presence means every part made it
+        await send_with_retry(
+            channel,
+            f"{title}\n"
+            f"{len(parts)} part(s) of `{upload_name}.gz` ({size} bytes), sha256 `{digest}`\n"
+            f"Reassemble by concatenating the parts in order: `cat {upload_name}.gz.part* > {upload_name}.gz`"
+        )
+    finally:
+        for part in parts:
+            os.remove(part)
+    return len(parts)
+
 # Background task to send daily logs
 @tasks.loop(hours=24)  # Run every 24 hours
 async def send_daily_log():
@@ -380,89 +818,53 @@ async def send_daily_log():
         log_action("Daily logs are currently disabled.")
         return
 
-    max_retries = 3
-    retry_delay = 5  # seconds
+    log_channel = client.get_channel(LOG_CHANNEL_ID)
+    if not log_channel:
+        log.error(f"Log channel with ID {LOG_CHANNEL_ID} not found.")
+        return
 
-    for attempt in range(max_retries):
-        try:
-            # Create a timestamp for the log file
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            log_file_name = f"bot_log_{timestamp}.txt"
-
-            # Read the log file content
-            with open(LOG_FILE, "r", encoding="utf-8") as file:
-                log_content = file.read()
-
-            # Write the log content to a new file with the timestamped name
-            with open(log_file_name, "w", encoding="utf-8") as new_file:
-                new_file.write(log_content)
-
-            # Send the log file to the specified channel
-            log_channel = client.get_channel(LOG_CHANNEL_ID)
-            if log_channel:
-                # Send the message with the log file
-                message = f"Here is the daily log file for {datetime.now().strftime('%Y-%m-%d')}:"
-                with open(log_file_name, "rb") as file:
-                    await log_channel.send(message, file=discord.File(file, filename=log_file_name))
-                log_action(f"Daily log file sent to channel {LOG_CHANNEL_ID}.")
-
-                # Clear the log file for the next day
-                with open(LOG_FILE, "w", encoding="utf-8") as file:
-                    file.truncate()
-
-                # Remove the temporary log file
-                os.remove(log_file_name)
-                break  # Exit the retry loop if successful
-            else:
-                log.error(f"Log channel with ID {LOG_CHANNEL_ID} not found.")
-                break
-        except Exception as e:
-            log.error(f"Attempt {attempt + 1} failed: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay)
-            else:
-                log.error("Max retries reached. Giving up.")
+    # Create a timestamp for the log file
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_file_name = f"bot_log_{timestamp}.txt"
+    archive_path = os.path.join(os.path.dirname(LOG_FILE), log_file_name)
 
-# Function to fetch the channel ID, channel name, and link from a channel name
-def fetch_channel_info_from_name(channel_name: str) -> dict:
-    global current_api_key_index
-    max_retries = len(YOUTUBE_API_KEYS)  # Maximum retries based on the number of keys
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, rotate_log_file, archive_path)
+    except OSError as e:
+        log.error(f"Failed to rotate the log file for the daily upload: {e}")
+        return
 
-    for _ in range(max_retries):
-        try:
-            # Get the current API key
-            api_key = YOUTUBE_API_KEYS[current_api_key_index]
-
-            # Make a request to the YouTube Data API to search for the channel by name
-            url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={channel_name}&type=channel&key={api_key}"
-            response = requests.get(url)
-            data = response.json()
-
-            # Check for quota exhaustion error
-            if "error" in data:
-                error_message = data["error"].get("message", "")
-                if "quotaExceeded" in error_message:
-                    log.warning(f"Quota exceeded for API key index {current_api_key_index}. Rotating to the next key.")
-                    rotate_api_key()
-                    continue  # Retry with the next key
-
-            # Check if the search returned any results
-            if "items" in data and data["items"]:
-                # Return the channel ID, channel name, and link
-                return {
-                    "channel_id": data["items"][0]["snippet"]["channelId"],
-                    "channel_name": data["items"][0]["snippet"]["title"],
-                    "channel_link": f"https://www.youtube.com/channel/{data['items'][0]['snippet']['channelId']}"
-                }
-            else:
-                log.error(f"No channel found for name: {channel_name}")
-                return None
-        except Exception as e:
-            log.error(f"Error fetching channel info from name: {e}")
+    try:
+        title = f"Here is the daily log file for {datetime.now().strftime('%Y-%m-%d')}:"
+        parts = await ship_log_file(log_channel, archive_path, log_file_name, title)
+        log_action(f"Daily log file sent to channel {LOG_CHANNEL_ID} in {parts} part(s).")
+        os.remove(archive_path)
+    except Exception as e:
+        log.error(f"Failed to send the daily log, kept it as {archive_path}: {e}")
+
+# Function to fetch the channel ID, channel name, and link from a channel name
+async def fetch_channel_info_from_name(channel_name: str) -> dict:
+    try:
+        # Search the YouTube Data API for the channel by name
+        data = await youtube_api.get("search", {"part": "snippet", "q": channel_name, "type": "channel"})
+        if data is None:
             return None
 
-    log.error("All YouTube API keys have exceeded their quota.")
-    return None
+        # Check if the search returned any results
+        if data.get("items"):
+            # Return the channel ID, channel name, and link
+            return {
+                "channel_id": data["items"][0]["snippet"]["channelId"],
+                "channel_name": data["items"][0]["snippet"]["title"],
+                "channel_link": f"https://www.youtube.com/channel/{data['items'][0]['snippet']['channelId']}"
+            }
+        else:
+            log.error(f"No channel found for name: {channel_name}")
+            return None
+    except Exception as e:
+        log.error(f"Error fetching channel info from name: {e}")
+        return None
 
 # Button for confirming or canceling the addition of a YouTube channel
 class ConfirmAddChannel(discord.ui.View):
@@ -524,13 +926,20 @@ class HealthCheckView(discord.ui.View):
             )
             
             # Check 2: YouTube API key status
-            api_key_status = "Working" if verify_api_keys() else "All keys exhausted"
+            api_key_status = "Working" if await verify_api_keys() else "All keys exhausted"
             embed.add_field(
                 name="YouTube API Keys",
                 value=api_key_status,
                 inline=False
             )
             
+            # Check 2b: Quota spent by each API key today
+            embed.add_field(
+                name="YouTube API Quota (resets at midnight Pacific time)",
+                value=key_scheduler.summary()[:1024],  # Embed field limit
+                inline=False
+            )
+            
             # Check 3: Monitoring task status
             task_status = "Running" if check_youtube.is_running() else "Stopped"
             embed.add_field(
@@ -573,16 +982,19 @@ class HealthCheckView(discord.ui.View):
                 ephemeral=True
             )
 
-def verify_api_keys():
+async def verify_api_keys():
     """Check if any API keys are still functional"""
-    test_url = "https://www.googleapis.com/youtube/v3/videos?part=snippet&id=dQw4w9WgXcQ"  # Rick Astley test video
+    test_params = {"part": "snippet", "id": "dQw4w9WgXcQ"}  # Rick Astley test video
     
-    for api_key in YOUTUBE_API_KEYS:
+    for index, api_key in enumerate(YOUTUBE_API_KEYS):
         try:
-            response = requests.get(f"{test_url}&key={api_key}", timeout=5)
-            if response.status_code == 200:
+            key_scheduler.charge(index, "videos")
+            status, data = await youtube_api.fetch("videos", test_params, api_key, timeout=5)
+            if is_quota_error(data):
+                key_scheduler.mark_exhausted(index)
+            if status == 200:
                 return True
-        except:
+        except Exception:
             continue
     return False
 
@@ -597,7 +1009,7 @@ async def add_channel(interaction: discord.Interaction, channel_name: str):
             return
 
         # Fetch the channel ID, channel name, and link from the channel name
-        channel_info = fetch_channel_info_from_name(channel_name)
+        channel_info = await fetch_channel_info_from_name(channel_name)
         if not channel_info:
             await interaction.response.send_message(f"Could not find a YouTube channel with the name: {channel_name}", ephemeral=True)
             log_action(f"Attempted to add channel with invalid name: {channel_name}", user=interaction.user.name)
@@ -630,7 +1042,7 @@ async def remove_channel(interaction: discord.Interaction, channel_name: str):
             return
 
         # Fetch the channel ID and channel name from the channel name
-        channel_info = fetch_channel_info_from_name(channel_name)
+        channel_info = await fetch_channel_info_from_name(channel_name)
         if not channel_info:
             await interaction.response.send_message(f"Could not find a YouTube channel with the name: {channel_name}", ephemeral=True)
             log_action(f"Attempted to remove channel with invalid name: {channel_name}", user=interaction.user.name)
@@ -641,6 +1053,7 @@ async def remove_channel(interaction: discord.Interaction, channel_name: str):
 
         if channel_id in monitored_channels:
             del monitored_channels[channel_id]
+            rss_feeds.forget(channel_id)
             save_monitored_channels()
             await client.update_monitored_count_status()
             await interaction.response.send_message(f"Removed YouTube channel `{channel_name}` from monitoring list.", ephemeral=True)
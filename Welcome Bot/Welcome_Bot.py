@@ -1,5 +1,8 @@
 import discord
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue, Full
+import atexit
 from discord.ext import commands, tasks
 from discord.ext.commands import Bot
 from PIL import Image, ImageDraw, ImageFont
@@ -14,18 +17,52 @@ from datetime import datetime
 # Load environment variables from .env file
 load_dotenv()
 
+# Set to true to write logs from a background thread instead of the event loop
+LOG_QUEUE_ENABLED = os.getenv('LOG_QUEUE_ENABLED', 'false').lower() == 'true'
+LOG_QUEUE_SIZE = 10000  # records buffered before new ones are dropped
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler for a bounded queue: when it is full records are dropped and counted instead of blocking"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.reported = 0
+
+    def enqueue(self, record):
+        if self.dropped > self.reported:
+            try:
+                self.queue.put_nowait(logging.makeLogRecord({
+                    'name': 'logging', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"Log queue full, dropped {self.dropped - self.reported} log records"
+                }))
+                self.reported = self.dropped
+            except Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
 # Set up logging configuration
 logger = logging.getLogger('discord')
 logger.setLevel(logging.DEBUG)
 handler = logging.StreamHandler()
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 # File handler to log to a file
 file_handler = logging.FileHandler('bot_log.txt')
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
+
+if LOG_QUEUE_ENABLED:
+    log_queue = Queue(maxsize=LOG_QUEUE_SIZE)
+    log_listener = QueueListener(log_queue, handler, file_handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    logger.addHandler(DroppingQueueHandler(log_queue))
+else:
+    logger.addHandler(handler)
+    logger.addHandler(file_handler)
 
 # Define bot intents
 intents = discord.Intents.default()
@@ -62,24 +99,44 @@ async def send_error_log(error_message):
     logger.error(f"Error: {error_message}")
     await send_log_message(f"**Error Log**: {error_message}")
 
+# Move the live log aside under the file handler's lock, so the (queue listener) thread writing it
+# can't be mid-record; the handler reopens a fresh bot_log.txt on the next record
+def rotate_log_file(archive_path):
+    file_handler.acquire()
+    try:
+        if file_handler.stream:
+            file_handler.stream.close()
+            file_handler.stream = None
+        os.replace("bot_log.txt", archive_path)
+    finally:
+        file_handler.release()
+
 # Function to send logs file to the log channel every 24 hours
 @tasks.loop(hours=24)
 async def send_logs_file():
     log_channel = bot.get_channel(LOG_CHANNEL_ID)
     if log_channel:
+        upload_name = f"logs_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
         try:
-            with open("bot_log.txt", "rb") as file:
-                await log_channel.send(file=discord.File(file, filename=f"logs_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"))
-            # Clear the log file after sending
-            open("bot_log.txt", "w").close()
-        except discord.HTTPException as e:
-            if e.status == 429:  # Rate limit hit
-                retry_after = e.retry_after
-                logger.warning(f"Rate limit hit. Retrying after {retry_after} seconds.")
-                await asyncio.sleep(retry_after)
-                await send_logs_file()  # Retry
-            else:
-                logger.error(f"Failed to send logs file: {e}")
+            await asyncio.get_running_loop().run_in_executor(None, rotate_log_file, upload_name)
+        except OSError as e:
+            logger.error(f"Failed to rotate the log file: {e}")
+            return
+
+        for attempt in range(3):
+            try:
+                await log_channel.send(file=discord.File(upload_name, filename=upload_name))
+                # The sent logs are no longer needed
+                os.remove(upload_name)
+                return
+            except discord.HTTPException as e:
+                if e.status == 429 and attempt < 2:  # Rate limit hit
+                    retry_after = getattr(e, 'retry_after', 5)
+                    logger.warning(f"Rate limit hit. Retrying after {retry_after} seconds.")
+                    await asyncio.sleep(retry_after)
+                else:
+                    logger.error(f"Failed to send logs file, kept it as {upload_name}: {e}")
+                    return
 
 @bot.event
 async def on_ready():